@@ -0,0 +1,152 @@
+"""
+Allocation report for the per-frame path (capture, mirror, colour
+conversion, landmark extraction), before and after the frame pool.
+
+    python alloc_report.py [--frames 300] [--size 1920x1080] [--video clip.mp4]
+
+Each frame is run with tracemalloc tracing and the peak memory above
+the pre-frame baseline is recorded, i.e. how many bytes the frame had to
+allocate at once. MediaPipe itself is replaced by a backend returning
+fixed landmarks, so only our own code is measured; with --video frames
+come from a file instead of a synthetic camera.
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import hand_tracking
+from frame_pool import FramePool, detect_frame, mirror_frame
+
+
+class SyntheticCamera:
+    """Stands in for cv2.VideoCapture; read(image) fills image in place like OpenCV."""
+
+    def __init__(self, shape):
+        rng = np.random.default_rng(0)
+        self.frames = [rng.integers(0, 256, shape, np.uint8) for _ in range(4)]
+        self.i = 0
+
+    def read(self, image=None):
+        src = self.frames[self.i % len(self.frames)]
+        self.i += 1
+        if image is None or image.shape != src.shape:
+            return True, src.copy()
+        image[:] = src
+        return True, image
+
+
+class LoopedVideo:
+    """A video file that starts over at the end, so any --frames count works."""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+
+    def read(self, image=None):
+        success, img = self.cap.read(image)
+        if not success:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, img = self.cap.read(image)
+        return success, img
+
+
+class FixedBackend:
+    """Two hands at fixed normalized positions; converts to RGB like the real backends."""
+
+    def __init__(self, reuse):
+        rng = np.random.default_rng(1)
+        self.hands = rng.uniform(0.2, 0.8, (2, 21, 2)).astype(np.float32)
+        self.reuse = reuse
+        self._rgb = None
+        self._out = np.zeros_like(self.hands)
+
+    def detect(self, img):
+        if not self.reuse:
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            return self.hands.copy()
+        if self._rgb is None or self._rgb.shape != img.shape:
+            self._rgb = np.empty(img.shape, np.uint8)
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        self._out[:] = self.hands
+        return self._out
+
+    def close(self):
+        pass
+
+
+def before_frame(cap, backend):
+    """The frame path as it was: new arrays and tuple lists every frame."""
+    success, img = cap.read()
+    img = cv2.flip(img, 1)
+    h, w, c = img.shape
+    found = [hand * (w, h) for hand in backend.detect(img)]
+    detected = [[(int(x), int(y)) for x, y in hand] for hand in found]
+    last_landmarks = list(detected[-1]).copy()
+    return img, detected, last_landmarks
+
+
+def after_frame(cap, pool, mirror):
+    frame = pool.read(cap, pool.acquire(), mirror_pixels=mirror == "pixels")
+    hands = detect_frame(hand_tracking.detect_hands, frame, mirror == "landmarks")
+    if mirror == "landmarks":
+        mirror_frame(frame)
+    n = min(len(hands), len(hand_tracking._last_hands))
+    np.copyto(hand_tracking._last_hands[:n], hands[:n])
+    pool.release(frame)
+    return frame.img, hands
+
+
+def measure(step, frames):
+    """Returns (mean, max) peak bytes allocated per frame and ms per frame."""
+    step()      # warm-up: first-use allocations (pool, buffers) don't count
+    step()
+    peaks = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(frames):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return np.mean(peaks), max(peaks), elapsed / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame allocations, before vs after")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--video", help="read frames from this file (looped)")
+    opts = parser.parse_args()
+
+    w, h = (int(v) for v in opts.size.split("x"))
+    shape = (h, w, 3)
+
+    def camera():
+        if opts.video:
+            return LoopedVideo(opts.video)
+        return SyntheticCamera(shape)
+
+    rows = []
+    cap = camera()
+    old_backend = FixedBackend(reuse=False)
+    rows.append(("before", measure(lambda: before_frame(cap, old_backend), opts.frames)))
+
+    for mirror in ("pixels", "landmarks"):
+        cap = camera()
+        hand_tracking.set_backend(FixedBackend(reuse=True))
+        pool = FramePool(count=1, shape=shape)
+        rows.append((f"after ({mirror})",
+                     measure(lambda: after_frame(cap, pool, mirror), opts.frames)))
+
+    print(f"{opts.frames} frames at {opts.video or f'{w}x{h}'}")
+    print(f"{'path':<20}{'mean KB/frame':>15}{'max KB/frame':>15}{'ms/frame':>10}")
+    for name, (mean, peak, ms) in rows:
+        print(f"{name:<20}{mean / 1024:15.1f}{peak / 1024:15.1f}{ms:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
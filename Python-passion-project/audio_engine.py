@@ -0,0 +1,294 @@
+import collections
+import threading
+import time
+import wave
+
+import numpy as np
+from sample_bank import SampleBank
+
+
+# -----------------------------
+# OUTPUT DEVICES
+# -----------------------------
+class NullOutput:
+    """
+    Discards audio. With realtime=True it sleeps one block per write,
+    like a sound card would, so latency measurements stay meaningful.
+    """
+
+    latency = 0.0
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.blocks = 0
+
+    def open(self, sample_rate, channels, block_size):
+        self.block_time = block_size / sample_rate
+        self._next = time.perf_counter()
+
+    def write(self, block):
+        self.blocks += 1
+        if self.realtime:
+            self._next += self.block_time
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next = time.perf_counter()
+
+    def close(self):
+        pass
+
+
+class FileOutput(NullOutput):
+    """Writes the mix to a WAV file (headless tests, renders)."""
+
+    def __init__(self, path, realtime=False):
+        super().__init__(realtime)
+        self.path = path
+        self._wav = None
+
+    def open(self, sample_rate, channels, block_size):
+        super().open(sample_rate, channels, block_size)
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, block):
+        self._wav.writeframes(block.tobytes())
+        super().write(block)
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class SoundDeviceOutput:
+    """Blocking PortAudio stream (needs the optional `sounddevice` package)."""
+
+    def __init__(self, device=None):
+        import sounddevice
+        self._sd = sounddevice
+        self.device = device
+        self.latency = 0.0
+
+    def open(self, sample_rate, channels, block_size):
+        self.stream = self._sd.OutputStream(samplerate=sample_rate, channels=channels,
+                                            dtype="int16", blocksize=block_size,
+                                            device=self.device, latency="low")
+        self.stream.start()
+        self.latency = self.stream.latency
+
+    def write(self, block):
+        self.stream.write(block)
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class PygameOutput:
+    """
+    Streams mixed blocks through one pygame channel, queueing the next
+    block while the current one plays. Used when sounddevice isn't installed.
+    """
+
+    def __init__(self):
+        import pygame
+        self._pygame = pygame
+
+    def open(self, sample_rate, channels, block_size):
+        mixer = self._pygame.mixer
+        mixer.quit()
+        mixer.init(frequency=sample_rate, size=-16, channels=channels, buffer=block_size)
+        self.channel = mixer.Channel(0)
+        self.block_time = block_size / sample_rate
+        self.latency = 2 * self.block_time
+
+    def write(self, block):
+        sound = self._pygame.mixer.Sound(buffer=block.tobytes())
+        if not self.channel.get_busy():
+            self.channel.play(sound)
+            return
+        while self.channel.get_queue() is not None:
+            time.sleep(self.block_time / 4)
+        self.channel.queue(sound)
+
+    def close(self):
+        self.channel.stop()
+
+
+def default_output():
+    """sounddevice if available, otherwise pygame."""
+    try:
+        return SoundDeviceOutput()
+    except (ImportError, OSError):
+        return PygameOutput()
+
+
+# -----------------------------
+# MIXER
+# -----------------------------
+class AudioEngine:
+    """
+    Polyphonic sample player.
+
+    Samples come from a SampleBank (memory-mapped files, pitch/gain
+    variants rendered on first use and cached). trigger() fetches the
+    note's audio and appends it to a queue, so the vision loop never
+    waits on the mixer and the mixer never renders a variant: a cache
+    miss is paid by the caller, and preload() avoids even that. A mixer
+    thread drains the queue at the start of each block, assigns voices
+    from a fixed pool (stealing the oldest voice when all are busy) and
+    writes the mix to the output device in blocks of block_size frames.
+
+    Trigger-to-output latency is measured for every trigger: the time from
+    trigger() until the block containing the note was handed to the device,
+    plus the device's own reported latency. It goes to latency_hook if set,
+    and to the `latencies` history otherwise.
+
+    trigger_hook, if set, is called with (sample_id, gain, trigger time)
+    on every trigger, e.g. to record the notes of a session.
+
+    volume is a master gain from 0 to 1, applied to notes as they are
+    triggered (the gain passed to trigger_hook includes it).
+    """
+
+    def __init__(self, sample_rate=44100, channels=2, block_size=256, voices=16,
+                 bank_budget=64 * 1024 * 1024):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bank = SampleBank(sample_rate, channels, bank_budget)
+
+        self.stolen = 0
+        self.volume = 1.0
+        self._queue = collections.deque()
+        self._blocks = 0
+        self.configure(block_size, voices)
+
+        self.latency_hook = None
+        self.trigger_hook = None
+        self.latencies = collections.deque(maxlen=1000)
+
+        self.output = None
+        self.running = False
+        self._thread = None
+
+    def configure(self, block_size, voices):
+        """Sets the block size and voice pool size. Call before start()."""
+        self.block_size = block_size
+        self._block = np.zeros((block_size, self.channels), np.float32)
+        self._out = np.zeros((block_size, self.channels), np.int16)
+
+        # voice pool
+        self.voice_sample = np.full(voices, -1, np.int32)   # -1 = free
+        self.voice_pos = np.zeros(voices, np.int64)
+        self.voice_gain = np.zeros(voices, np.float32)
+        self.voice_started = np.zeros(voices, np.int64)     # block number, for stealing
+        # audio each voice is playing; held here so cache eviction can't cut a note
+        self.voice_data = [None] * voices
+
+    def load(self, path, semitones=0, gain=1.0):
+        """Returns the sample id for a WAV, optionally pitch-shifted / scaled."""
+        return self.bank.variant(self.bank.add(path), semitones, gain)
+
+    def preload(self, sample_ids):
+        """Renders samples ahead of time so their first trigger doesn't pay for it (-1 = none)."""
+        for sample_id in set(np.asarray(sample_ids, np.int64).tolist()):
+            if sample_id >= 0:
+                self.bank.get(sample_id)
+
+    def trigger(self, sample_id, gain=1.0):
+        """
+        Queues a note. Safe to call from any thread; only waits to render
+        the sample if it isn't cached.
+        """
+        t = time.perf_counter()
+        gain *= self.volume
+        self._queue.append((sample_id, self.bank.get(sample_id), gain, t))
+        if self.trigger_hook is not None:
+            self.trigger_hook(sample_id, gain, t)
+
+    def start(self, output=None):
+        self.output = output if output is not None else default_output()
+        self.output.open(self.sample_rate, self.channels, self.block_size)
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.output is not None:
+            self.output.close()
+
+    def _run(self):
+        while self.running:
+            block, triggered = self.mix_block()
+            self.output.write(block)
+
+            if triggered:
+                out_time = time.perf_counter() + self.output.latency
+                for t in triggered:
+                    self._report_latency(t, out_time)
+
+    def _report_latency(self, trigger_time, out_time):
+        if self.latency_hook is not None:
+            self.latency_hook(trigger_time, out_time)
+        else:
+            self.latencies.append(out_time - trigger_time)
+
+    def _start_voice(self, sample_id, data, gain):
+        free = np.flatnonzero(self.voice_sample < 0)
+        if free.size:
+            v = free[0]
+        else:
+            v = int(np.argmin(self.voice_started))
+            self.stolen += 1
+        self.voice_sample[v] = sample_id
+        self.voice_data[v] = data
+        self.voice_pos[v] = 0
+        self.voice_gain[v] = gain
+        self.voice_started[v] = self._blocks
+
+    def mix_block(self):
+        """Mixes one block. Returns (int16 block, trigger times started in it)."""
+        triggered = []
+        while self._queue:
+            sample_id, data, gain, t = self._queue.popleft()
+            self._start_voice(sample_id, data, gain)
+            triggered.append(t)
+
+        out = self._block
+        out[:] = 0
+        n = self.block_size
+
+        for v in np.flatnonzero(self.voice_sample >= 0):
+            data = self.voice_data[v]
+            pos = self.voice_pos[v]
+            chunk = data[pos:pos + n]
+            out[:len(chunk)] += chunk * self.voice_gain[v]
+            self.voice_pos[v] = pos + n
+            if pos + n >= len(data):
+                self.voice_sample[v] = -1
+                self.voice_data[v] = None
+
+        np.clip(out, -1.0, 1.0, out=out)
+        np.multiply(out, 32767, out=out)
+        self._out[:] = out
+        self._blocks += 1
+        return self._out, triggered
+
+    def active_voices(self):
+        return int((self.voice_sample >= 0).sum())
+
+    def latency_stats(self):
+        """(p50, p95, max) trigger-to-output latency in ms over recent triggers."""
+        if not self.latencies:
+            return (0.0, 0.0, 0.0)
+        lat = np.array(self.latencies) * 1000
+        return (float(np.percentile(lat, 50)), float(np.percentile(lat, 95)), float(lat.max()))
@@ -0,0 +1,226 @@
+"""
+Runs hand tracking and the node logic over a video file offline.
+
+    python batch.py VIDEO [--out annotated.avi] [--events events.csv] [--workers N]
+                    [--chunk 240] [--overlap 15] [--flip] [--effect pulse]
+                    [main.py options, e.g. --predict --skeleton tips --infer-width 640]
+
+Hand detection, which is most of the cost, runs on chunks of the video
+in a process pool, each worker with its own MediaPipe Hands. A worker
+starts `overlap` frames before its chunk and throws those results away,
+so MediaPipe's tracking has settled by the chunk's first frame.
+
+The chunks' landmarks are then taken in order, as they arrive, by one
+pass through main.draw_frame: touch state, --predict smoothing and
+effects carry straight across chunk boundaries, so the events are the
+ones a live run over the same landmarks would fire. With --out the
+frames are decoded again for that pass, drawn on and handed to a
+recording.VideoEncoder thread.
+
+--events writes every node touch as CSV, or JSON for a .json path.
+Options not listed here go to main.py's parser (audio is off).
+Run from the repository root like main.py (the node layout loads its WAVs).
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+
+import main
+import ui
+import hand_tracking
+from frame_pool import MAX_HANDS
+from inference import InProcessInference
+from nodes import nodes
+from recording import VideoEncoder
+
+
+# -----------------------------
+# DETECTION WORKERS
+# -----------------------------
+def _init_worker(model_settings, infer_width, roi):
+    hand_tracking.set_backend(InProcessInference(**model_settings))
+    hand_tracking.infer_width = infer_width
+    hand_tracking.roi_mode = roi
+
+
+def open_at(path, frame):
+    """Opens the video positioned so the next read() returns `frame`."""
+    cap = cv2.VideoCapture(path)
+    if frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame:
+            # not seekable: skip ahead without decoding
+            cap.release()
+            cap = cv2.VideoCapture(path)
+            for _ in range(frame):
+                cap.grab()
+    return cap
+
+
+def detect_chunk(path, start, end, overlap, flip):
+    """
+    Landmarks of frames start..end-1 as (start, int32 (n, MAX_HANDS, 21, 2),
+    n_hands). Runs in a worker process.
+    """
+    first = max(0, start - overlap)
+    cap = open_at(path, first)
+    hand_tracking.last_boxes = []
+
+    hands = np.zeros((end - start, MAX_HANDS, 21, 2), np.int32)
+    n_hands = np.zeros(end - start, np.int32)
+    buf = None
+    for f in range(first, end):
+        success, img = cap.read(buf)
+        if not success:
+            hands, n_hands = hands[:f - start], n_hands[:f - start]
+            break
+        buf = img
+        if flip:
+            cv2.flip(img, 1, dst=img)
+        if f < start:
+            hand_tracking.detect_hands(img)
+        else:
+            n_hands[f - start] = len(hand_tracking.detect_hands(img, hands[f - start]))
+    cap.release()
+    return start, hands, n_hands
+
+
+# -----------------------------
+# OUTPUT
+# -----------------------------
+def write_events(path, events):
+    """events: (frame, seconds, node, x, y, effect) tuples, as CSV or (.json) JSON."""
+    fields = ("frame", "time", "node", "x", "y", "effect")
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump([dict(zip(fields, e)) for e in events], f, indent=1)
+    else:
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(fields)
+            out.writerows(events)
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def chunks(frames, size):
+    return [(s, min(s + size, frames)) for s in range(0, frames, size)]
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Process a video offline",
+                                     epilog="other options are passed to main.py")
+    parser.add_argument("video")
+    parser.add_argument("--out", help="write the annotated video here (MJPG .avi)")
+    parser.add_argument("--events", help="write node touches here (.csv or .json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="detection processes (default: one per core)")
+    parser.add_argument("--chunk", type=int, default=240, help="frames per chunk")
+    parser.add_argument("--overlap", type=int, default=15,
+                        help="frames each chunk detects before its start to settle tracking")
+    parser.add_argument("--flip", action="store_true",
+                        help="mirror the frames first, like the live camera view")
+    parser.add_argument("--effect", default=ui.current_effect,
+                        help="node effect to trigger: " + ", ".join(ui.effect_labels) +
+                             ", or several joined with + (e.g. pulse+glow)")
+    opts, rest = parser.parse_known_args()
+    try:
+        ui.add_effect_option(opts.effect)
+    except ValueError as e:
+        parser.error(f"--effect: {e}")
+
+    main.parser.set_defaults(audio_output="null")
+    main.args = main.parser.parse_args(rest)
+    main.apply_settings()
+    ui.current_effect = opts.effect
+
+    cap = cv2.VideoCapture(opts.video)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    if opts.out is None:
+        cap.release()
+        cap = None
+    if frames <= 0:
+        print(f"can't read a frame count from {opts.video}")
+        return
+
+    encoder = VideoEncoder(opts.out, fps, shape) if opts.out else None
+    blank = np.zeros(shape, np.uint8)
+    detected = np.zeros((MAX_HANDS, 21, 2), np.int32)
+    events = []
+    drawn = 0
+    draw_time = 0.0
+
+    start = time.perf_counter()
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=opts.workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(main.model_settings, main.args.infer_width, main.args.roi))
+    try:
+        jobs = [pool.submit(detect_chunk, opts.video, s, e, opts.overlap, opts.flip)
+                for s, e in chunks(frames, opts.chunk)]
+        # in order, so the node logic sees every frame after the one before it
+        for job in jobs:
+            first, hands, n_hands = job.result()
+            for i in range(len(n_hands)):
+                f = first + i
+                if encoder is not None:
+                    # wait for a buffer rather than drop: nothing here is live
+                    img = encoder.acquire(block=True)
+                    success, _ = cap.read(img)
+                    if not success:
+                        # shorter than its frame count said; the workers stopped there too
+                        encoder.release(img)
+                        break
+                    if opts.flip:
+                        cv2.flip(img, 1, dst=img)
+                else:
+                    img = blank
+                    img[:] = 0
+
+                busy = time.perf_counter()
+                n = int(n_hands[i])
+                detected[:n] = hands[i, :n]
+                t = f / fps
+                for row in main.draw_frame(img, detected[:n], t, now=t).tolist():
+                    events.append((f, round(t, 4), row, int(nodes.x[row]), int(nodes.y[row]),
+                                   ui.current_effect))
+                draw_time += time.perf_counter() - busy
+                if encoder is not None:
+                    encoder.write(img)
+                drawn += 1
+            print(f"frames {first}-{first + len(n_hands) - 1}: "
+                  f"{drawn / (time.perf_counter() - start):.1f} fps so far")
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if encoder is not None:
+            encoder.close()
+        if cap is not None:
+            cap.release()
+
+    seconds = time.perf_counter() - start
+    print(f"{drawn}/{frames} frames in {seconds:.1f} s ({drawn / seconds:.1f} fps) "
+          f"with {opts.workers} detection workers; {len(events)} node touches")
+    print(f"drawing {draw_time / max(drawn, 1) * 1000:.2f} ms/frame", end="")
+    if encoder is not None:
+        print(f", encoding {encoder.busy / max(drawn, 1) * 1000:.2f} ms/frame", end="")
+    print()
+    if opts.events:
+        write_events(opts.events, events)
+        print(f"wrote {len(events)} events to {opts.events}")
+    if main.recorder is not None:
+        print(f"recorded {main.recorder.close()} frames to {main.args.record}")
+
+
+# workers are spawned and re-import this file
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+"""
+Microbenchmark: per-landmark cv2.line/cv2.circle drawing vs SkeletonRenderer.
+
+    python bench_skeleton.py [--hands 2] [--frames 2000] [--size 1280x720]
+
+Hands are random 21-point clusters about the size of a hand at webcam
+distance. Prints the mean cost per frame in microseconds, and the joint
+pixels each way of drawing leaves on a blank frame, so a level that
+silently draws nothing shows up (exits with an error if one does).
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from skeleton import HAND_CONNECTIONS, LODS, SkeletonRenderer
+
+
+def per_landmark(img, hands, selected):
+    # the old draw_hands loop
+    for hand in hands.tolist():
+        for a, b in HAND_CONNECTIONS:
+            cv2.line(img, hand[a], hand[b], (224, 224, 224), 2)
+        for lx, ly in hand:
+            cv2.circle(img, (lx, ly), 4, (0, 0, 255), -1)
+        cv2.circle(img, hand[selected], 10, (0, 255, 255), 2)
+
+
+def joint_pixels(fn, size, hands, color=(0, 0, 255)):
+    """Pixels of the joint colour fn draws on a blank frame (bones drawn over them excluded)."""
+    img = np.zeros(size[::-1] + (3,), np.uint8)
+    fn(img, hands, 8)
+    return int((img == color).all(axis=2).sum())
+
+
+def run(fn, img, hands, frames):
+    fn(img, hands, 8)
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(img, hands, 8)
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skeleton drawing cost")
+    parser.add_argument("--hands", type=int, default=2)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--size", default="1280x720")
+    opts = parser.parse_args()
+
+    w, h = (int(v) for v in opts.size.split("x"))
+    img = np.zeros((h, w, 3), np.uint8)
+    rng = np.random.default_rng(0)
+    origins = rng.integers(0, (w - 150, h - 150), (opts.hands, 1, 2))
+    hands = (origins + rng.integers(0, 150, (opts.hands, 21, 2))).astype(np.int32)
+
+    print(f"{opts.hands} hands, {opts.frames} frames at {w}x{h}")
+    print(f"{'':<16}{'us/frame':>10}{'joint px':>10}")
+    print(f"{'per-landmark':<16}{run(per_landmark, img, hands, opts.frames):10.1f}"
+          f"{joint_pixels(per_landmark, (w, h), hands):10d}")
+    ok = True
+    for lod in LODS:
+        renderer = SkeletonRenderer(lod)
+        pixels = joint_pixels(renderer.draw, (w, h), hands)
+        print(f"{'batched ' + lod:<16}{run(renderer.draw, img, hands, opts.frames):10.1f}"
+              f"{pixels:10d}")
+        ok &= (pixels > 0) == (lod != "off")
+    if not ok:
+        sys.exit("a level of detail drew the wrong joints")
+
+
+if __name__ == "__main__":
+    main()
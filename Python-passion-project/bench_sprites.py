@@ -0,0 +1,93 @@
+"""
+Microbenchmark: direct cv2.circle drawing vs SpriteCache blits.
+
+    python bench_sprites.py [--nodes 50] [--frames 300] [--size 1280x720]
+
+For each primitive, draws the same circles both ways for a number of
+frames and prints the mean cost per frame. The "bloom" rows compare a
+real per-frame Gaussian-blurred glow against the cached sprite.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from sprites import SpriteCache
+
+
+def direct_disc(img, x, y, r):
+    cv2.circle(img, (x, y), r, (255, 0, 0), -1)
+
+
+def direct_ring(img, x, y, r):
+    cv2.circle(img, (x, y), r * 2, (0, 255, 255), 2)
+
+
+def direct_ring_aa(img, x, y, r):
+    # same anti-aliased look as the sprite
+    cv2.circle(img, (x, y), r * 2, (0, 255, 255), 2, cv2.LINE_AA)
+
+
+def direct_glow(img, x, y, r):
+    # what the old code drew: a thin 2 px ring
+    cv2.circle(img, (x, y), r + 12, (0, 200, 255), 2)
+
+
+def direct_bloom(img, x, y, r):
+    # a real bloom drawn from scratch: ring on a scratch layer, blur, add
+    pad = r + 12 + 20
+    x0, y0 = max(x - pad, 0), max(y - pad, 0)
+    roi = img[y0:y + pad, x0:x + pad]
+    layer = np.zeros_like(roi)
+    cv2.circle(layer, (x - x0, y - y0), r + 12, (0, 200, 255), 4)
+    layer = cv2.GaussianBlur(layer, (0, 0), 6)
+    cv2.add(roi, layer, dst=roi)
+
+
+def run(fn, positions, frames, size):
+    img = np.zeros((size[1], size[0], 3), np.uint8)
+    start = time.perf_counter()
+    for _ in range(frames):
+        for x, y, r in positions:
+            fn(img, x, y, r)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sprite cache vs direct drawing")
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1280x720")
+    opts = parser.parse_args()
+
+    size = tuple(int(v) for v in opts.size.split("x"))
+    rng = np.random.default_rng(0)
+    positions = [(int(rng.integers(0, size[0])), int(rng.integers(0, size[1])), 40)
+                 for _ in range(opts.nodes)]
+
+    cache = SpriteCache()
+    cases = [
+        ("disc", direct_disc,
+         lambda img, x, y, r: cache.draw(img, "disc", x, y, r, (255, 0, 0))),
+        ("ring", direct_ring,
+         lambda img, x, y, r: cache.draw(img, "ring", x, y, r * 2, (0, 255, 255), thickness=2)),
+        ("ring (AA)", direct_ring_aa,
+         lambda img, x, y, r: cache.draw(img, "ring", x, y, r * 2, (0, 255, 255), thickness=2)),
+        ("glow (old ring)", direct_glow,
+         lambda img, x, y, r: cache.draw(img, "glow", x, y, r + 12, (0, 200, 255), thickness=2)),
+        ("glow (bloom)", direct_bloom,
+         lambda img, x, y, r: cache.draw(img, "glow", x, y, r + 12, (0, 200, 255), thickness=2)),
+    ]
+
+    print(f"{opts.nodes} nodes, {opts.frames} frames at {size[0]}x{size[1]} (ms per frame)")
+    print(f"{'primitive':<18}{'direct':>10}{'sprite':>10}")
+    for name, direct, cached in cases:
+        d = run(direct, positions, opts.frames, size)
+        s = run(cached, positions, opts.frames, size)
+        print(f"{name:<18}{d:10.3f}{s:10.3f}")
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
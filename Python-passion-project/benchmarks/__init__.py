@@ -0,0 +1,7 @@
+"""
+Benchmarks for the per-frame hot paths: landmark extraction, skeleton
+drawing, collisions, node effects, particles, the dropdown UI and
+gesture recognition, over synthetic workloads scaled by nodes, hands,
+simultaneous bursts and frame size. Only the MediaPipe model is replaced (benchmarks/fake_mediapipe.py),
+so they run on any CPU box. See benchmarks/__main__.py for usage.
+"""
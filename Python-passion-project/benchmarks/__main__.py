@@ -0,0 +1,162 @@
+"""
+Runs the benchmark workloads and compares result files.
+
+    python Python-passion-project/benchmarks run [--out results.json] [--only collisions]
+                                                 [--frames 300] [--baseline old.json]
+    python Python-passion-project/benchmarks compare old.json new.json [--threshold 0.1]
+
+Run from the repository root like main.py (the node layout loads its WAVs).
+
+`run` times every parameter set of every workload (or those whose name
+contains --only) frame by frame, prints mean / p50 / p95 in microseconds
+and writes them as JSON with the machine and library versions. `compare`
+(or `run --baseline`) matches benchmarks by name and flags a regression
+when the chosen metric grew by more than --threshold (a fraction) and by
+more than --min-us; it exits with status 1 if any did.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+# run as a directory, the package's parent (where main.py lives) isn't on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+FORMAT = 1
+
+
+def bench_name(workload, params):
+    return workload + "/" + ",".join(f"{k}={v}" for k, v in params.items())
+
+
+def time_workload(fn, params, frames, warmup):
+    """Per-frame times in microseconds of one workload parameter set."""
+    base, step = fn(**params)
+    img = base.copy()
+    for i in range(warmup):
+        np.copyto(img, base)
+        step(img, i)
+
+    times = np.empty(frames)
+    for i in range(frames):
+        np.copyto(img, base)
+        start = time.perf_counter_ns()
+        step(img, warmup + i)
+        times[i] = time.perf_counter_ns() - start
+    return times / 1000
+
+
+def run(opts):
+    from benchmarks.workloads import WORKLOADS
+
+    results = []
+    print(f"{'benchmark':<58}{'mean':>9}{'p50':>9}{'p95':>9}  (us)")
+    for workload, (fn, param_sets) in WORKLOADS.items():
+        for params in param_sets:
+            name = bench_name(workload, params)
+            if opts.only and not any(o in name for o in opts.only):
+                continue
+            t = time_workload(fn, params, opts.frames, opts.warmup)
+            result = {"name": name, "workload": workload, "params": params,
+                      "frames": opts.frames, "mean_us": float(t.mean()),
+                      "p50_us": float(np.percentile(t, 50)),
+                      "p95_us": float(np.percentile(t, 95))}
+            results.append(result)
+            print(f"{name:<58}{result['mean_us']:9.1f}{result['p50_us']:9.1f}"
+                  f"{result['p95_us']:9.1f}")
+
+    report = {
+        "format": FORMAT,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpus": os.cpu_count(), "python": platform.python_version(),
+                    "numpy": np.__version__, "opencv": cv2.__version__},
+        "results": results,
+    }
+    if opts.out:
+        with open(opts.out, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"wrote {len(results)} results to {opts.out}")
+
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            old = json.load(f)
+        if opts.only:
+            old["results"] = [r for r in old["results"] if any(o in r["name"] for o in opts.only)]
+        return compare_reports(old, report, opts)
+    return 0
+
+
+def compare_reports(old, new, opts):
+    """Prints old vs new per benchmark. Returns 1 if anything regressed, else 0."""
+    key = opts.metric + "_us"
+    old_results = {r["name"]: r for r in old["results"]}
+    new_results = {r["name"]: r for r in new["results"]}
+    if old.get("machine") != new.get("machine"):
+        print("note: results come from different machines or library versions")
+
+    regressions = 0
+    print(f"{'benchmark':<58}{'old':>9}{'new':>9}{'change':>9}  ({opts.metric} us)")
+    for name, r in new_results.items():
+        if name not in old_results:
+            print(f"{name:<58}{'':>9}{r[key]:9.1f}{'new':>9}")
+            continue
+        before, after = old_results[name][key], r[key]
+        change = after / before - 1 if before > 0 else 0.0
+        flag = ""
+        if change > opts.threshold and after - before > opts.min_us:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -opts.threshold and before - after > opts.min_us:
+            flag = "  faster"
+        print(f"{name:<58}{before:9.1f}{after:9.1f}{change:+9.1%}{flag}")
+    for name in old_results.keys() - new_results.keys():
+        print(f"{name:<58}{old_results[name][key]:9.1f}{'':>9}{'gone':>9}")
+
+    print(f"{regressions} regression(s) over {opts.threshold:.0%} in {opts.metric}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame hot path benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def compare_options(p):
+        p.add_argument("--threshold", type=float, default=0.10,
+                       help="slowdown (fraction) that counts as a regression")
+        p.add_argument("--min-us", type=float, default=5.0,
+                       help="ignore changes smaller than this many microseconds")
+        p.add_argument("--metric", choices=("p50", "mean", "p95"), default="p50")
+
+    p = commands.add_parser("run", help="run the benchmarks")
+    p.add_argument("--out", help="write the results to this JSON file")
+    p.add_argument("--only", action="append",
+                   help="only benchmarks whose name contains this (repeatable)")
+    p.add_argument("--frames", type=int, default=300)
+    p.add_argument("--warmup", type=int, default=20)
+    p.add_argument("--baseline", help="compare against this results file afterwards")
+    compare_options(p)
+
+    p = commands.add_parser("compare", help="compare two results files")
+    p.add_argument("old")
+    p.add_argument("new")
+    compare_options(p)
+
+    opts = parser.parse_args()
+    if opts.command == "run":
+        return run(opts)
+    with open(opts.old) as f:
+        old = json.load(f)
+    with open(opts.new) as f:
+        new = json.load(f)
+    return compare_reports(old, new, opts)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import sys
+import types
+
+import numpy as np
+
+
+class _Landmark:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.z = 0.0
+
+
+class _HandLandmarks:
+    def __init__(self, points):
+        self.landmark = [_Landmark(x, y) for x, y in points]
+
+
+class _Results:
+    def __init__(self, hands):
+        self.multi_hand_landmarks = [_HandLandmarks(h) for h in hands] or None
+
+
+class Hands:
+    """
+    Stands in for mediapipe.solutions.hands.Hands: process() skips the
+    model and cycles through precomputed results shaped like MediaPipe's
+    (hands moving on smooth paths), so everything around it still runs.
+    """
+
+    hands = 2       # hands "found" per frame, set by install()
+    cycle = 64      # frames before the motion repeats
+
+    def __init__(self, max_num_hands=2, model_complexity=1, **kwargs):
+        n = min(self.hands, max_num_hands)
+        rng = np.random.default_rng(0)
+        shape = rng.uniform(-0.06, 0.06, (21, 2))
+        phase = np.linspace(0, 2 * np.pi, self.cycle, endpoint=False)
+        self._results = []
+        for p in phase:
+            hands = []
+            for h in range(n):
+                centre = (0.3 + 0.4 * h + 0.15 * np.cos(p + h), 0.5 + 0.25 * np.sin(2 * p + h))
+                hands.append((centre + shape).tolist())
+            self._results.append(_Results(hands))
+        self._i = 0
+
+    def process(self, rgb):
+        results = self._results[self._i]
+        self._i = (self._i + 1) % self.cycle
+        return results
+
+    def close(self):
+        pass
+
+
+def install(hands=2):
+    """Makes `import mediapipe` give this stand-in, finding `hands` hands per frame."""
+    Hands.hands = hands
+    module = types.ModuleType("mediapipe")
+    module.solutions = types.SimpleNamespace(hands=types.SimpleNamespace(Hands=Hands))
+    sys.modules["mediapipe"] = module
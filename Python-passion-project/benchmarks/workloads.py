@@ -0,0 +1,219 @@
+"""
+Synthetic per-frame workloads. Each one sets up its state from its
+parameters and returns (img, step): step(img, i) does frame i's work on
+img, which the runner resets to the background before every frame.
+"""
+import math
+
+import numpy as np
+
+import effects
+import gestures as gestures_module
+import hand_tracking
+import nodes as nodes_module
+import ui
+from frame_pool import MAX_HANDS
+from inference import InProcessInference
+from nodes import NodeTable, handle_collisions
+
+from benchmarks import fake_mediapipe
+
+SIZES = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def background(size):
+    """A noisy frame, so colour conversion and blending see camera-like data."""
+    w, h = SIZES[size]
+    return np.random.default_rng(0).integers(0, 256, (h, w, 3), np.uint8)
+
+
+def node_grid(count, size, radius=30):
+    """`count` silent nodes spread evenly over the frame."""
+    w, h = SIZES[size]
+    cols = math.ceil(math.sqrt(count * w / h))
+    rows = math.ceil(count / cols)
+    table = NodeTable(capacity=max(16, count))
+    for k in range(count):
+        r, c = divmod(k, cols)
+        table.add(int((c + 0.5) * w / cols), int((r + 0.5) * h / rows), radius, -1)
+    return table
+
+
+def fingertip_paths(hands, size, frames=64):
+    """Per frame, one point per hand sweeping across the whole frame."""
+    w, h = SIZES[size]
+    t = np.linspace(0, 2 * np.pi, frames, endpoint=False)
+    paths = []
+    for i in range(frames):
+        paths.append([(int(w / 2 + 0.45 * w * math.cos(t[i] + k)),
+                       int(h / 2 + 0.45 * h * math.sin(3 * t[i] + 2 * k)))
+                      for k in range(hands)])
+    return paths
+
+
+# landmarks of a few hand poses, in palm sizes with the wrist at (0, 0), fingers up
+_OPEN = [(0, 0), (-0.25, -0.2), (-0.5, -0.4), (-0.7, -0.56), (-0.9, -0.72),
+         (-0.3, -1.0), (-0.35, -1.45), (-0.38, -1.75), (-0.4, -2.0),
+         (0, -1.05), (0, -1.5), (0, -1.8), (0, -2.05),
+         (0.25, -1.0), (0.28, -1.42), (0.3, -1.7), (0.32, -1.92),
+         (0.48, -0.9), (0.55, -1.25), (0.6, -1.45), (0.64, -1.62)]
+_FIST = _OPEN[:5] + [(-0.3, -1.0), (-0.33, -1.35), (-0.3, -1.1), (-0.28, -0.9),
+                     (0, -1.05), (0, -1.4), (0, -1.15), (0, -0.95),
+                     (0.25, -1.0), (0.27, -1.32), (0.26, -1.1), (0.25, -0.92),
+                     (0.48, -0.9), (0.52, -1.18), (0.5, -1.0), (0.48, -0.85)]
+_PINCH = _OPEN[:2] + [(-0.5, -0.4), (-0.62, -0.7), (-0.55, -0.98),
+                      (-0.3, -1.0), (-0.42, -1.35), (-0.52, -1.2), (-0.55, -1.02)] + _OPEN[9:]
+POSES = {"open": np.array(_OPEN), "fist": np.array(_FIST), "pinch": np.array(_PINCH)}
+
+
+def hand_sequence(hands, size, frames=64, palm=70):
+    """
+    Int (frames, hands, 21, 2) landmarks: each hand holds an open palm,
+    a pinch and a fist for a quarter of the cycle each, then swipes across.
+    """
+    w, h = SIZES[size]
+    out = np.zeros((frames, hands, 21, 2), np.int32)
+    quarter = frames // 4
+    for i in range(frames):
+        phase, k = divmod(i, quarter)
+        pose = POSES[("open", "pinch", "fist", "open")[min(phase, 3)]]
+        for j in range(hands):
+            x = w * (0.3 + 0.4 * j) + 10 * math.sin(i / 5)
+            y = h * 0.75
+            if phase >= 3:
+                x += k / quarter * 0.4 * w
+            out[i, j] = pose * palm + (x, y)
+    return out
+
+
+def use_backend(hands, infer_width=0, roi=False):
+    fake_mediapipe.install(hands)
+    hand_tracking.set_backend(InProcessInference(max_num_hands=max(hands, 1)))
+    hand_tracking.infer_width = infer_width
+    hand_tracking.roi_mode = roi
+    hand_tracking.last_boxes = []
+
+
+# -----------------------------
+# WORKLOADS
+# -----------------------------
+def landmarks(hands=2, size="720p", infer_width=0, roi=False):
+    """hand_tracking.detect_hands: RGB conversion, resize, landmark extraction, scaling."""
+    use_backend(hands, infer_width, roi)
+    out = np.zeros((MAX_HANDS, 21, 2), np.int32)
+
+    def step(img, i):
+        hand_tracking.detect_hands(img, out)
+    return background(size), step
+
+
+def process_hands(hands=2, size="720p", lod="full"):
+    """hand_tracking.process_hands: detection plus skeleton drawing and click index."""
+    use_backend(hands)
+    hand_tracking.renderer.lod = lod
+
+    def step(img, i):
+        hand_tracking.process_hands(img)
+    return background(size), step
+
+
+def collisions(nodes=4, hands=2, effect="pulse", swept=False, size="720p"):
+    """nodes.handle_collisions: touch test, node drawing and node effects."""
+    table = node_grid(nodes, size)
+    nodes_module.nodes = table
+    use_budgets(False)
+    effects.particles.rng = np.random.default_rng(0)
+    paths = fingertip_paths(hands, size)
+
+    def step(img, i):
+        points = paths[i % len(paths)]
+        previous = paths[(i - 1) % len(paths)] if swept else None
+        handle_collisions(img, points, effect, previous)
+    return background(size), step
+
+
+def use_budgets(on):
+    """Effect budgets on (the app's) or off, so a workload times all of its instances."""
+    for effect in effects.EFFECTS.values():
+        effect.budget_ms = type(effect).budget_ms if on else math.inf
+        effect.cap = effect.limit
+    effects.clear_effects()
+
+
+def node_effects(nodes=16, effect="glow", size="720p", every=8, budget=False):
+    """effects.update_node_effects with every node re-triggered every `every` frames."""
+    table = node_grid(nodes, size)
+    use_budgets(budget)
+    rows = np.arange(table.n)
+
+    def step(img, i):
+        if i % every == 0:
+            effects.trigger_node_effects(table, rows, effect)
+        effects.update_node_effects(img, table)
+    return background(size), step
+
+
+def particles(bursts=8, burst=14, size="720p", every=2, budget=False):
+    """`bursts` simultaneous particle bursts every `every` frames, stepped and drawn."""
+    use_budgets(budget)
+    effects.particles.rng = np.random.default_rng(0)
+    w, h = SIZES[size]
+    table = NodeTable(capacity=bursts)
+    for x, y in np.random.default_rng(1).integers((50, 50), (w - 50, h - 50), (bursts, 2)).tolist():
+        table.add(x, y, 30, -1, burst=burst)
+    rows = np.arange(table.n)
+
+    def step(img, i):
+        if i % every == 0:
+            effects.trigger_node_effects(table, rows, "particles")
+        effects.update_node_effects(img, table)
+    return background(size), step
+
+
+def dropdown(open=False, cached=True, size="720p"):
+    """The effects dropdown: the cached overlay blit (draw_ui) or drawn from scratch."""
+    ui.dropdown_open = open
+    ui.current_effect = "particles"
+
+    def step(img, i):
+        if cached:
+            ui.draw_ui(img)
+        else:
+            ui.draw_dropdown(img)
+    return background(size), step
+
+
+def gestures(hands=2, history=16):
+    """gestures.GestureTracker.update: ring buffer, features and debounced classification."""
+    tracker = gestures_module.GestureTracker(history=history)
+    seq = hand_sequence(hands, "720p")
+
+    def step(img, i):
+        tracker.update(seq[i % len(seq)], i / 30)
+    return np.zeros((1, 1, 3), np.uint8), step
+
+
+def grid(**axes):
+    """Every combination of the given parameter values, as dicts."""
+    combos = [{}]
+    for name, values in axes.items():
+        combos = [{**c, name: v} for c in combos for v in values]
+    return combos
+
+
+# workload name -> (function, parameter sets)
+WORKLOADS = {
+    "landmarks": (landmarks, grid(hands=[1, 2], size=list(SIZES))
+                  + grid(hands=[2], size=["1080p"], infer_width=[640], roi=[False, True])),
+    "process_hands": (process_hands, grid(hands=[1, 2], lod=["full", "tips"])),
+    "collisions": (collisions, grid(nodes=[4, 64, 512], hands=[1, 2], swept=[False, True])
+                   + grid(nodes=[64], effect=["none", "glow", "shockwave", "particles"])),
+    "node_effects": (node_effects, grid(nodes=[16, 128],
+                                        effect=["pulse", "glow", "shockwave", "particles"])
+                     + grid(nodes=[128], effect=["pulse+glow+shockwave+particles"],
+                            budget=[False, True])),
+    "particles": (particles, grid(bursts=[1, 8, 32], size=["720p", "1080p"])
+                  + grid(bursts=[32], size=["1080p"], budget=[True])),
+    "dropdown": (dropdown, grid(open=[False, True], cached=[True, False])),
+    "gestures": (gestures, grid(hands=[0, 1, 2], history=[16, 64])),
+}
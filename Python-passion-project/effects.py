@@ -1,61 +1,291 @@
+import time
+
 import cv2
-import random
-import math
-
-def trigger_node_effect(node, effect):
-    """Initializes the visual effect state for a blue node."""
-    if effect == "pulse":
-        node["pulse_r"] = node["radius"]
-
-    elif effect == "glow":
-        node["glow_alpha"] = 255
-
-    elif effect == "shockwave":
-        node["shockwave_r"] = node["radius"]
-
-    elif effect == "particles":
-        node["particles"].clear()
-        for i in range(10):
-            ang = random.uniform(0, 2*math.pi)
-            sp = random.uniform(3, 6)
-            node["particles"].append({
-                "x": node["x"],
-                "y": node["y"],
-                "vx": math.cos(ang)*sp,
-                "vy": math.sin(ang)*sp,
-                "life": random.randint(15, 30)
-            })
-
-
-def update_node_effects(img, node):
-    """Updates and draws the visual effect for a blue node."""
-    # PULSE
-    if node["pulse_r"] > 0:
-        cv2.circle(img, (node["x"], node["y"]), int(node["pulse_r"]), (0,255,255), 2)
-        node["pulse_r"] += 4
-        if node["pulse_r"] > node["radius"]*3:
-            node["pulse_r"] = 0
-
-    # SHOCKWAVE
-    if node["shockwave_r"] > 0:
-        cv2.circle(img, (node["x"], node["y"]), int(node["shockwave_r"]), (255,255,0), 1)
-        node["shockwave_r"] += 6
-        if node["shockwave_r"] > node["radius"]*4:
-            node["shockwave_r"] = 0
-
-    # GLOW BLOOM
-    if node["glow_alpha"] > 0:
-        col = (0, node["glow_alpha"], 255)
-        cv2.circle(img, (node["x"], node["y"]), node["radius"]+12, col, 2)
-        node["glow_alpha"] = max(0, node["glow_alpha"] - 15)
-
-    # PARTICLES
-    alive = []
-    for p in node["particles"]:
-        p["x"] += p["vx"]
-        p["y"] += p["vy"]
-        p["life"] -= 1
-        if p["life"] > 0:
-            alive.append(p)
-            cv2.circle(img, (int(p["x"]), int(p["y"])), 3, (255,255,255), -1)
-    node["particles"] = alive
+import numpy as np
+from particles import ParticlePool
+from sprites import sprites
+
+# one pool shared by every node's particle bursts
+particles = ParticlePool(capacity=65536)
+
+# "bloom" = blurred glow sprite, "ring" = plain fading ring (fewer pixels to blend)
+glow_quality = "bloom"
+
+
+class Effect:
+    """
+    One kind of node effect. Its running instances are rows of a few
+    small arrays (struct of arrays) owned by the effect: the node row
+    each one plays on plus the effect's own FIELDS. A node can have any
+    number of instances of any effects at once.
+
+    start() adds instances for a batch of nodes, update() steps and draws
+    all of them in one batched pass (step(), written per effect) and drops
+    the finished ones; the rest stay in start order, oldest first.
+
+    Each effect has a frame time budget: update() keeps a running average
+    of its cost per instance, and the instance cap is the number of
+    instances that fit in budget_ms at that cost. When the instances
+    running would go over budget the cap drops to that number at once and
+    the oldest are culled; the cap only grows back once the budget has
+    room for a quarter more, by at most a quarter a frame, so it doesn't
+    flap around the limit.
+    """
+
+    name = None
+    label = None
+    FIELDS = {}             # instance column -> dtype, besides "row"
+    budget_ms = 1.0
+    min_cap = 8
+
+    def __init__(self, capacity=64, limit=4096):
+        self.n = 0
+        self.limit = limit
+        self.cap = limit
+        self.cost_ms = 0.0
+        self.instance_ms = 0.0  # running average cost per instance
+        self.culled = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        for name, dtype in {"row": np.intp, **self.FIELDS}.items():
+            new = np.zeros(capacity, dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def _columns(self):
+        return [getattr(self, name) for name in ("row", *self.FIELDS)]
+
+    def __len__(self):
+        return self.n
+
+    def start(self, table, rows):
+        """Starts an instance on each of the node rows; the oldest make room past the cap."""
+        rows = np.asarray(rows, np.intp)[-self.cap:]
+        k = len(rows)
+        if not k:
+            return
+        if self.n + k > self.cap:
+            self.cull(self.cap - k)
+        if self.n + k > self.capacity:
+            self._alloc(max(self.capacity * 2, self.n + k))
+        new = slice(self.n, self.n + k)
+        self.row[new] = rows
+        self.init(table, new, rows)
+        self.n += k
+
+    def init(self, table, new, rows):
+        """Sets the FIELDS of the new instances `new` (a slice) on node rows."""
+        raise NotImplementedError
+
+    def step(self, img, table):
+        """Draws and advances every instance. Returns a bool array: still running."""
+        raise NotImplementedError
+
+    def cull(self, keep):
+        """Drops all but the newest `keep` instances."""
+        drop = self.n - max(keep, 0)
+        if drop <= 0:
+            return
+        for col in self._columns():
+            col[:self.n - drop] = col[drop:self.n]
+        self.n -= drop
+        self.culled += drop
+
+    def clear(self):
+        self.n = 0
+
+    def update(self, img, table):
+        n = self.n
+        if not n:
+            self._budget(0.0, 0)
+            return
+        start = time.perf_counter()
+        running = np.flatnonzero(self.step(img, table))
+        if len(running) < self.n:
+            for col in self._columns():
+                col[:len(running)] = col[running]
+            self.n = len(running)
+        self._budget((time.perf_counter() - start) * 1000, n)
+
+    def _budget(self, ms, n):
+        """Adjusts the cap after a frame that cost `ms` for `n` instances."""
+        self.cost_ms += 0.1 * (ms - self.cost_ms)
+        if not n:
+            return
+        # per instance, so the average doesn't lag behind culls
+        per = ms / n
+        self.instance_ms += (per - self.instance_ms) * (0.1 if self.instance_ms else 1.0)
+        fits = int(min(self.limit, self.budget_ms / max(self.instance_ms, 1e-9)))
+        if len(self) * self.instance_ms > self.budget_ms:
+            self.cap = max(self.min_cap, fits)
+            self.cull(self.cap)
+        elif fits >= self.cap * 1.25 and self.cap < self.limit:
+            self.cap = min(fits, self.cap + max(1, self.cap // 4))
+
+    def stats(self):
+        return (f"{self.name}: {len(self)} running, cap {self.cap}, "
+                f"{self.cost_ms:.2f}/{self.budget_ms:.1f} ms "
+                f"({self.instance_ms * 1000:.1f} us each), {self.culled} culled")
+
+
+class RingEffect(Effect):
+    """
+    A ring from the node's edge growing by `speed` px a frame up to
+    `reach` radii. Hard-edged and opaque, so drawn with cv2.circle
+    directly: the sprite cache is slower for those (bench_sprites.py).
+    """
+
+    FIELDS = {"r": np.float32}
+    color = (255, 255, 255)
+    thickness = 1
+    speed = 4
+    reach = 3
+
+    def init(self, table, new, rows):
+        self.r[new] = table.radius[rows]
+
+    def step(self, img, table):
+        n = self.n
+        rows, r = self.row[:n], self.r[:n]
+        for x, y, radius in zip(table.x[rows].tolist(), table.y[rows].tolist(),
+                                r.astype(np.int32).tolist()):
+            cv2.circle(img, (x, y), radius, self.color, self.thickness)
+        r += self.speed
+        return r <= table.radius[rows] * self.reach
+
+
+class PulseEffect(RingEffect):
+    name, label = "pulse", "Pulse Ring"
+    color = (0, 255, 255)
+    thickness = 2
+
+
+class ShockwaveEffect(RingEffect):
+    name, label = "shockwave", "Shockwave"
+    color = (255, 255, 0)
+    speed = 6
+    reach = 4
+
+
+class GlowEffect(Effect):
+    """Blurred ring around the node that fades out (a plain ring with glow_quality "ring")."""
+
+    name, label = "glow", "Glow Bloom"
+    FIELDS = {"alpha": np.int32}
+    budget_ms = 2.0
+
+    def init(self, table, new, rows):
+        self.alpha[new] = 255
+
+    def step(self, img, table):
+        n = self.n
+        rows, alpha = self.row[:n], self.alpha[:n]
+        primitive = "glow" if glow_quality == "bloom" else "ring"
+        for x, y, radius, a in zip(table.x[rows].tolist(), table.y[rows].tolist(),
+                                   (table.radius[rows] + table.glow_pad[rows]).tolist(),
+                                   alpha.tolist()):
+            a = sprites.bucket(a)
+            sprites.draw(img, primitive, x, y, radius, (0, a, 255), alpha=a, thickness=2)
+        alpha -= 15
+        return alpha > 0
+
+
+class ParticleEffect(Effect):
+    """
+    A burst of `burst` particles per node. The particles themselves are
+    the instances: they live in the shared ParticlePool, which already
+    steps and draws them all at once, and culling kills the ones closest
+    to dying.
+    """
+
+    name, label = "particles", "Particle Burst"
+    budget_ms = 3.0
+    min_cap = 256
+
+    def __init__(self, pool, limit=65536):
+        self.pool = pool
+        super().__init__(capacity=0, limit=limit)
+
+    def __len__(self):
+        return len(self.pool)
+
+    def start(self, table, rows):
+        for x, y, burst in zip(table.x[rows].tolist(), table.y[rows].tolist(),
+                               table.burst[rows].tolist()):
+            burst = min(burst, self.cap - len(self.pool))
+            if burst > 0:
+                self.pool.emit(x, y, burst, speed=(3, 6), life=(15, 30))
+
+    def cull(self, keep):
+        self.culled += self.pool.cull(max(keep, 0))
+
+    def clear(self):
+        self.pool.clear()
+
+    def update(self, img, table):
+        n = len(self.pool)
+        if not n:
+            self._budget(0.0, 0)
+            return
+        start = time.perf_counter()
+        self.pool.update()
+        self.pool.draw(img)
+        self._budget((time.perf_counter() - start) * 1000, n)
+
+
+# -----------------------------
+# REGISTRY
+# -----------------------------
+# effect name -> Effect, in drawing order
+EFFECTS = {}
+
+
+def register(effect):
+    """Adds an effect (replacing one of the same name). Returns it."""
+    EFFECTS[effect.name] = effect
+    return effect
+
+
+register(PulseEffect())
+register(ShockwaveEffect())
+register(GlowEffect())
+register(ParticleEffect(particles))
+
+
+def effect_names(mode):
+    """
+    Effects an effect mode starts: "none", one effect name, or several
+    stacked with "+" (e.g. "pulse+glow"). Raises ValueError for unknown ones.
+    """
+    names = [] if mode == "none" else mode.split("+")
+    for name in names:
+        if name not in EFFECTS:
+            raise ValueError(f"unknown effect {name!r} (have: {', '.join(EFFECTS)})")
+    return names
+
+
+def effect_label(mode):
+    return " + ".join(EFFECTS[name].label for name in effect_names(mode)) or "None"
+
+
+def trigger_node_effects(table, rows, mode):
+    """Starts the effects of `mode` on the given NodeTable rows."""
+    if len(rows):
+        for name in effect_names(mode):
+            EFFECTS[name].start(table, rows)
+
+
+def update_node_effects(img, table):
+    """Steps and draws every running effect instance, one batched pass per effect."""
+    for effect in EFFECTS.values():
+        effect.update(img, table)
+
+
+def clear_effects():
+    """Stops every effect, e.g. when the node rows they play on are replaced."""
+    for effect in EFFECTS.values():
+        effect.clear()
@@ -0,0 +1,110 @@
+import threading
+
+import cv2
+import numpy as np
+
+from profiler import profiler
+
+LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class FlowTracker:
+    """
+    Wraps a detect function (e.g. hand_tracking.detect_hands) so MediaPipe
+    only runs every `every` frames. In between, the 21 landmarks of each
+    hand are carried forward with pyramidal Lucas-Kanade optical flow, so
+    fingertips keep moving every frame instead of freezing.
+
+    A full detection is forced early when:
+      - the hand moves faster than motion_threshold px/frame (flow gets unreliable),
+      - forward-backward flow error exceeds max_drift px (points sliding off the hand),
+      - more than max_lost of the points lose track.
+
+    Returns the same int32 (hands, 21, 2) array as detect and takes the
+    same optional `out` buffer, so it drops in anywhere detect_hands is used.
+    """
+
+    def __init__(self, detect, every=3, motion_threshold=25.0, max_drift=2.0, max_lost=0.3):
+        self.detect = detect
+        self.every = every
+        self.motion_threshold = motion_threshold
+        self.max_drift = max_drift
+        self.max_lost = max_lost
+
+        self.prev_gray = None
+        self.points = None          # float32 (hands, 21, 2)
+        self._gray = [None, None]   # this frame's and the previous frame's gray image
+        self.since_detect = 0
+        self._lock = threading.Lock()
+
+        # counters
+        self.detections = 0
+        self.flow_frames = 0
+        self.forced = {"motion": 0, "drift": 0, "lost": 0}
+
+    def __call__(self, img, out=None):
+        with self._lock:
+            # ping-pong between two gray buffers instead of allocating one per frame
+            gray = self._gray[0]
+            if gray is None or gray.shape != img.shape[:2]:
+                gray = np.empty(img.shape[:2], np.uint8)
+            cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+
+            tracked = None
+            if self.points is not None and len(self.points) and self.since_detect < self.every - 1:
+                with profiler.stage("flow"):
+                    tracked = self._flow(gray)
+
+            if tracked is None:
+                detected = self.detect(img, out)
+                self.points = detected.astype(np.float32)
+                self.since_detect = 0
+                self.detections += 1
+            else:
+                self.points = tracked
+                self.since_detect += 1
+                self.flow_frames += 1
+                if out is None:
+                    out = np.zeros(tracked.shape, np.int32)
+                detected = out[:len(tracked)]
+                np.copyto(detected, tracked, casting="unsafe")
+
+            self.prev_gray = gray
+            self._gray = [self._gray[1], gray]
+            return detected
+
+    def _flow(self, gray):
+        """Returns the landmarks moved to this frame, or None to force a detection."""
+        p0 = self.points.reshape(-1, 1, 2)
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None, **LK_PARAMS)
+        back, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, p1, None, **LK_PARAMS)
+
+        ok = (st.ravel() == 1) & (st_back.ravel() == 1)
+        if 1.0 - ok.mean() > self.max_lost:
+            self.forced["lost"] += 1
+            return None
+
+        drift = np.linalg.norm((p0 - back).reshape(-1, 2), axis=1)
+        if np.median(drift[ok]) > self.max_drift:
+            self.forced["drift"] += 1
+            return None
+
+        moved = (p1 - p0).reshape(-1, 2)
+        if np.median(np.linalg.norm(moved[ok], axis=1)) > self.motion_threshold:
+            self.forced["motion"] += 1
+            return None
+
+        # points that lost track follow their hand's median motion so the
+        # skeleton (and the selected fingertip) stays continuous
+        moved = moved.reshape(-1, 21, 2)
+        ok = ok.reshape(-1, 21)
+        for hand in range(len(moved)):
+            if not ok[hand].all():
+                shift = np.median(moved[hand][ok[hand]], axis=0) if ok[hand].any() else 0.0
+                moved[hand][~ok[hand]] = shift
+
+        return self.points + moved
+
+    def stats(self):
+        return f"detect: {self.detections}  flow: {self.flow_frames}  forced: {self.forced}"
@@ -0,0 +1,134 @@
+import queue
+import time
+
+import cv2
+import numpy as np
+
+from profiler import profiler
+
+MAX_HANDS = 2
+
+
+class Frame:
+    """
+    One reusable set of per-frame buffers.
+
+    raw        camera image as captured
+    img        mirrored image that gets drawn on and shown
+    landmarks  int32 (MAX_HANDS, 21, 2); the first n_hands rows are valid
+    t          time.perf_counter() when the camera returned it
+    """
+
+    def __init__(self, shape, max_hands=MAX_HANDS):
+        self.raw = np.empty(shape, np.uint8)
+        self.img = np.empty(shape, np.uint8)
+        self.landmarks = np.zeros((max_hands, 21, 2), np.int32)
+        self.n_hands = 0
+        self.seq = 0
+        self.t = 0.0
+
+    @property
+    def hands(self):
+        return self.landmarks[:self.n_hands]
+
+
+class FramePool:
+    """
+    Fixed set of Frames handed out by acquire() and given back with
+    release(), so capture, flip, colour conversion and landmark extraction
+    write into the same arrays every frame instead of allocating new ones.
+
+    `shape` is only a first guess: if the camera delivers a different
+    size, read() reallocates the pool once and carries on.
+    """
+
+    def __init__(self, count=4, shape=(480, 640, 3), max_hands=MAX_HANDS):
+        self.count = count
+        self.max_hands = max_hands
+        self.shape = None
+        self.free = None
+        self.waits = 0      # times acquire() found every frame in use
+        self.resizes = 0
+        self.reshape(shape)
+
+    def reshape(self, shape):
+        """Replaces every frame; frames of the old shape are dropped on release."""
+        self.shape = tuple(shape)
+        self.free = queue.Queue()
+        for _ in range(self.count):
+            self.free.put(Frame(self.shape, self.max_hands))
+
+    def acquire(self, timeout=None):
+        """Returns a free Frame, or None if none was released in time."""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            self.waits += 1
+        try:
+            return self.free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, frame):
+        if frame is not None and frame.raw.shape == self.shape:
+            self.free.put(frame)
+
+    def read(self, cap, frame, mirror_pixels=True):
+        """
+        Reads the next camera frame into frame.raw (and its mirror image
+        into frame.img with mirror_pixels). Returns the filled Frame, or
+        None once the camera stops; either way `frame` is no longer yours.
+        """
+        with profiler.stage("capture"):
+            success, img = cap.read(frame.raw)
+        if not success:
+            self.release(frame)
+            return None
+        t = time.perf_counter()
+        if img is not frame.raw:
+            # OpenCV allocated a new image because the size didn't match
+            self.resizes += 1
+            self.reshape(img.shape)
+            frame = self.free.get_nowait()
+            frame.raw[:] = img
+        frame.t = t
+        if mirror_pixels:
+            with profiler.stage("flip"):
+                cv2.flip(frame.raw, 1, dst=frame.img)
+        return frame
+
+    def stats(self):
+        return f"frames: {self.count}  waits: {self.waits}  resizes: {self.resizes}"
+
+
+def detect_frame(detect, frame, landmarks_mirrored=False):
+    """
+    Runs detect(img, out) on a filled Frame, writing into frame.landmarks.
+    With landmarks_mirrored the camera image is searched and the landmarks
+    are mirrored afterwards (frame.img is then filled by mirror_frame).
+    """
+    if landmarks_mirrored:
+        hands = mirror_landmarks(detect(frame.raw, frame.landmarks), frame.raw.shape[1])
+    else:
+        hands = detect(frame.img, frame.landmarks)
+    frame.n_hands = len(hands)
+    return hands
+
+
+def mirror_frame(frame):
+    """Fills frame.img with the mirrored raw image (landmark-mirroring mode)."""
+    with profiler.stage("flip"):
+        cv2.flip(frame.raw, 1, dst=frame.img)
+
+
+def mirror_landmarks(hands, width):
+    """Mirrors pixel landmarks in place, matching what cv2.flip(img, 1) does to pixels."""
+    np.subtract(width - 1, hands[..., 0], out=hands[..., 0])
+    return hands
+
+
+def camera_shape(cap):
+    """(h, w, 3) the camera reports, or 640x480 if it doesn't say."""
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+    return (h, w, 3)
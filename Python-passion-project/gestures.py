@@ -0,0 +1,238 @@
+import numpy as np
+
+import ui
+from frame_pool import MAX_HANDS
+
+# gesture codes; GESTURES[code] is the name
+NONE, PINCH, FIST, OPEN_PALM, SWIPE_LEFT, SWIPE_RIGHT = range(6)
+GESTURES = ("none", "pinch", "fist", "open_palm", "swipe_left", "swipe_right")
+
+# (base, joint, end) landmarks whose angle at the joint says how bent a finger is:
+# thumb IP, then the PIP joint of index, middle, ring and pinky
+FINGER_JOINTS = np.array([(2, 3, 4), (5, 6, 8), (9, 10, 12), (13, 14, 16), (17, 18, 20)])
+PALM = [0, 5, 9, 13, 17]
+# every landmark pair a feature measures, so one gather gets all their vectors:
+# palm size, pinch, fingertips and middle joints to the wrist, and both
+# bones at each finger joint
+PAIRS = np.array([(9, 0), (4, 8)]
+                 + [(j, 0) for j in FINGER_JOINTS[:, 2]]
+                 + [(j, 0) for j in FINGER_JOINTS[:, 1]]
+                 + [(b, j) for b, j, _ in FINGER_JOINTS]
+                 + [(e, j) for _, j, e in FINGER_JOINTS])
+TIP, PIP, BONE_IN, BONE_OUT = 2, 7, 12, 17
+
+# gesture tests in priority order (see GestureTracker.update)
+PRIORITY = np.array([SWIPE_LEFT, SWIPE_RIGHT, FIST, PINCH, OPEN_PALM], np.int32)
+
+
+class GestureTracker:
+    """
+    Recognizes hand gestures from a short history of landmarks.
+
+    The last `history` frames of every hand slot are kept in a fixed-size
+    ring buffer, float32 (history, max_hands, 21, 2), with their times.
+    update() matches the new hands to slots by palm distance (MediaPipe's
+    hand order is not stable), writes them into the ring and computes,
+    for all hands at once:
+      - pinch: thumb tip to index tip distance,
+      - angles: bend angle of each finger's middle joint (180 = straight),
+      - velocity: palm centre velocity over the last `swipe_window` seconds,
+    all lengths in palm sizes (wrist to middle finger base), so they don't
+    depend on how far the hand is from the camera.
+
+    Each hand's gesture for the frame is the first of swipe, fist, pinch
+    and open palm whose test passes. A gesture becomes a hand's active one
+    after `hold` frames in a row (swipes at once, as their window already
+    spans several frames), and a swipe can't fire again on the same hand
+    for `cooldown` seconds, so the hand moving back doesn't swipe the
+    other way. The work per frame is a handful of array operations over
+    the hands and the ring, whatever the gestures are.
+    """
+
+    def __init__(self, history=16, max_hands=MAX_HANDS, hold=3, cooldown=0.5,
+                 pinch_distance=0.35, straight=150.0, swipe_window=0.25,
+                 swipe_speed=4.0, max_match=150.0):
+        self.history = history
+        self.max_hands = max_hands
+        self.points = np.zeros((history, max_hands, 21, 2), np.float32)
+        self.centres = np.zeros((history, max_hands, 2), np.float32)
+        self.times = np.full(history, -np.inf)
+        self.present = np.zeros((history, max_hands), bool)
+        self.head = 0
+
+        self.hold = np.full(len(GESTURES), hold, np.int32)
+        self.hold[[SWIPE_LEFT, SWIPE_RIGHT]] = 1
+        self.cooldown = cooldown
+        self.pinch_distance = pinch_distance
+        self.straight = np.cos(np.radians(straight))
+        self.swipe_window = swipe_window
+        self.swipe_speed = swipe_speed
+        self.max_match = max_match
+
+        # debouncing, per slot
+        self.candidate = np.zeros(max_hands, np.int32)
+        self.count = np.zeros(max_hands, np.int32)
+        self.active = np.zeros(max_hands, np.int32)
+        self.swipe_until = np.full(max_hands, -np.inf)
+
+        # last update's hands: their slots and features
+        self.slots = np.zeros(0, np.intp)
+        self.pinch = np.zeros(0, np.float32)
+        self.cos = np.zeros((0, 5), np.float32)
+        self.velocity = np.zeros((0, 2), np.float32)
+        # thumb and index tip midpoint of every slot, e.g. to drag a value with a pinch
+        self.pinch_point = np.zeros((max_hands, 2), np.float32)
+
+    def _match(self, centres):
+        """Slot of each hand: the nearest last-frame palm, else a free slot."""
+        d = np.hypot(*(centres[:, None] - self.centres[self.head][None]).transpose(2, 0, 1))
+        d[:, ~self.present[self.head]] = np.inf
+        nearest = d.argmin(axis=1)
+        if (d[np.arange(len(d)), nearest] < self.max_match).all() and \
+                len(set(nearest.tolist())) == len(nearest):
+            # the usual case: every hand is still nearest its own slot
+            return nearest
+        slots = np.full(len(centres), -1, np.intp)
+        taken = np.zeros(self.max_hands, bool)
+        # closest (hand, slot) pairs first; at most MAX_HANDS ** 2 of them
+        for k in np.argsort(d, axis=None).tolist():
+            h, s = divmod(k, self.max_hands)
+            if d[h, s] >= self.max_match:
+                break
+            if slots[h] < 0 and not taken[s]:
+                slots[h] = s
+                taken[s] = True
+        for h in np.flatnonzero(slots < 0).tolist():
+            s = int(np.flatnonzero(~taken)[0])
+            slots[h] = s
+            taken[s] = True
+        return slots
+
+    def update(self, hands, t):
+        """
+        Adds int (n, 21, 2) landmarks seen at time t. Returns the gestures
+        that started this frame as (slot, name) pairs.
+        """
+        hands = np.asarray(hands, np.float32)[:self.max_hands]
+        if not len(hands):
+            # nothing to measure; every slot lets go and starts its history over
+            self.head = (self.head + 1) % self.history
+            self.times[self.head] = t
+            self.present[:] = False
+            self.slots = self.slots[:0]
+            return self._debounce(self.slots, self.slots, np.ones(self.max_hands, bool), t)
+
+        centres = hands[:, PALM].sum(axis=1) / len(PALM)
+        slots = self._match(centres)
+        # a slot that lost its hand starts its history over
+        lost = np.ones(self.max_hands, bool)
+        lost[slots] = False
+        self.present[:, lost] = False
+        self.head = (self.head + 1) % self.history
+        self.times[self.head] = t
+        self.present[self.head] = False
+        self.points[self.head, slots] = hands
+        self.centres[self.head, slots] = centres
+        self.present[self.head, slots] = True
+        self.slots = slots
+
+        # features, all hands at once
+        v = hands[:, PAIRS[:, 0]] - hands[:, PAIRS[:, 1]]
+        length = np.sqrt((v * v).sum(axis=2))
+        scale = length[:, 0] + 1e-6
+        self.pinch = length[:, 1] / scale
+        self.cos = ((v[:, BONE_IN:BONE_OUT] * v[:, BONE_OUT:]).sum(axis=2) /
+                    (length[:, BONE_IN:BONE_OUT] * length[:, BONE_OUT:] + 1e-6))
+        reaching = length[:, TIP:PIP] > length[:, PIP:BONE_IN]
+        extended = reaching & (self.cos < self.straight)
+
+        # palm velocity against the oldest frame in the window, per slot
+        age = t - self.times
+        in_window = self.present[:, slots] & ((age > 0) & (age <= self.swipe_window))[:, None]
+        oldest = np.argmax(np.where(in_window, age[:, None], -1.0), axis=0)
+        moving = in_window.any(axis=0)
+        dt = np.where(moving, age[oldest], 1.0)
+        moved = np.where(moving[:, None], centres - self.centres[oldest, slots], 0.0)
+        self.velocity = moved / (dt * scale)[:, None]
+
+        vx, vy = self.velocity.T
+        swipe = (np.abs(vx) > self.swipe_speed) & (np.abs(vx) > 2 * np.abs(vy))
+        tests = np.stack([swipe & (vx < 0), swipe, ~reaching[:, 1:].any(axis=1),
+                          self.pinch < self.pinch_distance, extended.all(axis=1)], axis=1)
+        raw = np.where(tests.any(axis=1), PRIORITY[tests.argmax(axis=1)], NONE)
+        self.pinch_point[slots] = (hands[:, 4] + hands[:, 8]) / 2
+        return self._debounce(slots, raw, lost, t)
+
+    def _debounce(self, slots, raw, gone, t):
+        gesture = np.full(self.max_hands, NONE, np.int32)
+        gesture[slots] = raw
+        self.count = np.where(gesture == self.candidate, self.count + 1, 1)
+        self.candidate = gesture
+
+        swipe = (gesture == SWIPE_LEFT) | (gesture == SWIPE_RIGHT)
+        change = (self.count >= self.hold[gesture]) & (gesture != self.active)
+        change &= ~(swipe & (t < self.swipe_until))
+        # a hand that went away lets go at once
+        change |= gone & (self.active != NONE)
+        self.active = np.where(change | gone, gesture, self.active)
+
+        started = change & (gesture != NONE)
+        self.swipe_until[started & swipe] = t + self.cooldown
+        return [(s, GESTURES[self.active[s]]) for s in np.flatnonzero(started).tolist()]
+
+    @property
+    def angles(self):
+        """Bend angle in degrees of every finger of the last update's hands (180 = straight)."""
+        return np.degrees(np.arccos(np.clip(self.cos, -1.0, 1.0)))
+
+    def active_names(self):
+        """Active gesture name of every hand from the last update, in hand order."""
+        return [GESTURES[g] for g in self.active[self.slots].tolist()]
+
+
+class GestureControls:
+    """
+    Maps gestures to the app, instead of the mouse:
+      - swipe right / left: next / previous node effect,
+      - pinch and move up or down: audio volume (a full swing is `volume_span` px),
+      - fist: mute, open palm: unmute.
+    """
+
+    def __init__(self, audio, volume_span=300.0):
+        self.audio = audio
+        self.volume_span = volume_span
+        self.unmuted = audio.volume
+        self.grab = {}      # pinching slot -> (y where it started, volume then)
+
+    def step_effect(self, step):
+        keys = [key for key, _ in ui.effect_options]
+        # an effect set outside the menu (a scene, a replay) steps from the first
+        i = keys.index(ui.current_effect) if ui.current_effect in keys else 0
+        ui.current_effect = keys[(i + step) % len(keys)]
+        print("Effect:", ui.effect_labels[ui.current_effect])
+
+    def apply(self, tracker, started):
+        for slot, name in started:
+            if name == "swipe_right":
+                self.step_effect(1)
+            elif name == "swipe_left":
+                self.step_effect(-1)
+            elif name == "fist" and self.audio.volume > 0:
+                self.unmuted = self.audio.volume
+                self.audio.volume = 0.0
+            elif name == "open_palm" and self.audio.volume == 0:
+                self.audio.volume = self.unmuted
+            elif name == "pinch":
+                self.grab[slot] = (float(tracker.pinch_point[slot, 1]), self.audio.volume)
+
+        for slot in list(self.grab):
+            if tracker.active[slot] != PINCH:
+                del self.grab[slot]
+                continue
+            y0, v0 = self.grab[slot]
+            dy = y0 - float(tracker.pinch_point[slot, 1])
+            self.audio.volume = float(np.clip(v0 + dy / self.volume_span, 0.0, 1.0))
+
+    def text(self, tracker):
+        names = " ".join(tracker.active_names()) or "-"
+        return f"gesture: {names}  volume {self.audio.volume:.0%}"
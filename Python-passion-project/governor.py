@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+
+
+class Governor:
+    """
+    Holds a target frame rate by trading quality for time.
+
+    `knobs` maps a setting name to the function that applies it, `base`
+    holds the starting value of each, and `steps` is a list of
+    (name, value) changes, cheapest-looking first. Quality level k means
+    the first k steps are in effect, so moving one level only ever
+    changes one setting.
+
+    Call tick(busy) once per frame with the seconds the frame actually
+    spent working (not waiting for the camera). Every `window` frames:
+      - mean busy time over the budget * down_ratio: one level down,
+      - under the budget * up_ratio for up_hold seconds: one level up,
+    and never twice within `cooldown` seconds. If a level that was just
+    restored has to be dropped again soon after, its up_hold doubles,
+    so the governor settles instead of flapping between two levels.
+    Every change is logged with the numbers that caused it.
+    """
+
+    def __init__(self, target_fps, knobs, base, steps, window=30,
+                 down_ratio=1.1, up_ratio=0.75, up_hold=3.0, cooldown=2.0, log=print):
+        self.budget = 1.0 / target_fps
+        self.knobs = knobs
+        self.steps = steps
+        self.window = window
+        self.down_ratio = down_ratio
+        self.up_ratio = up_ratio
+        self.cooldown = cooldown
+        self.log = log
+
+        # settings in effect at each level
+        self.levels = [dict(base)]
+        for name, value in steps:
+            self.levels.append({**self.levels[-1], name: value})
+        # hold[k]: seconds of headroom needed before going back up to level k
+        self.hold = [up_hold] * len(self.levels)
+
+        self.level = 0
+        self.changes = 0
+        self._times = np.zeros(window)
+        self._n = 0
+        self._last_change = -cooldown
+        self._headroom_since = None
+        self._raised_at = None
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def tick(self, busy, now=None):
+        """Records one frame's busy time in seconds; may change the quality level."""
+        self._times[self._n] = busy
+        self._n += 1
+        if self._n < self.window:
+            return
+        self._n = 0
+
+        now = time.perf_counter() if now is None else now
+        mean = self._times.mean()
+        if mean > self.budget * self.down_ratio:
+            self._headroom_since = None
+            if self.level < len(self.steps) and now - self._last_change >= self.cooldown:
+                if self._raised_at is not None and now - self._raised_at < 2 * self.hold[self.level]:
+                    # this level was just given back and didn't hold: wait longer next time
+                    self.hold[self.level] *= 2
+                self._set(self.level + 1, now, mean)
+        elif mean < self.budget * self.up_ratio:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            waited = now - self._headroom_since
+            if (self.level > 0 and waited >= self.hold[self.level - 1]
+                    and now - self._last_change >= self.cooldown):
+                self._set(self.level - 1, now, mean)
+                self._raised_at = now
+                self._headroom_since = None
+        else:
+            self._headroom_since = None
+
+    def _set(self, level, now, mean):
+        old, new = self.levels[self.level], self.levels[level]
+        changed = {k: v for k, v in new.items() if old.get(k) != v}
+        for name, value in changed.items():
+            self.knobs[name](value)
+
+        p95 = np.percentile(self._times, 95)
+        what = ", ".join(f"{k}={v}" for k, v in changed.items())
+        self.log(f"quality {self.level} -> {level}/{len(self.steps)} ({what}): "
+                 f"frame mean {mean * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms "
+                 f"over {self.window} frames, budget {self.budget * 1000:.1f} ms")
+        if level > self.level:
+            self._raised_at = None
+        self.level = level
+        self.changes += 1
+        self._last_change = now
+
+    def stats(self):
+        return f"quality level: {self.level}/{len(self.steps)}  changes: {self.changes}"
@@ -1,61 +1,248 @@
+import threading
+
 import cv2
-import mediapipe as mp
+import numpy as np
+from spatial_index import GridIndex
+from frame_pool import MAX_HANDS
+from skeleton import SkeletonRenderer
+
+# inference backend (see inference.py); main.py sets it once the model has
+# loaded. Until then detect_hands finds no hands.
+backend = None
+
+# inference resolution: frames (or ROI crops) wider than this are
+# downscaled before inference. 0 = full resolution
+infer_width = 0
+
+# ROI mode: run inference on a padded crop around last frame's hands and
+# only search the full frame when that finds nothing
+roi_mode = False
+roi_padding = 0.25      # fraction of the box size added on each side
+last_boxes = []         # (x0, y0, x1, y1) per hand from the previous frame
+roi_fallbacks = 0       # times the ROI lost the hands and the full frame was searched
+
+# per-thread resize buffer for downscaled inference
+_scratch = threading.local()
+
+# landmarks of every hand from the last drawn frame (a view of _last_hands)
+_last_hands = np.zeros((MAX_HANDS, 21, 2), np.int32)
+last_landmarks = _last_hands[:0]
+selected_landmark = 8   # default = index fingertip
 
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=2)
-mp_draw = mp.solutions.drawing_utils
+# landmarks that play the nodes on every hand; None = just selected_landmark
+touch_landmarks = None
 
-# stores latest list of all 21 landmarks
-last_landmarks = []
-selected_landmark = 8   # default = index fingertip
+# draws the skeleton; main.py sets its level of detail
+renderer = SkeletonRenderer()
 
+# click radius for selecting a landmark
+LANDMARK_PICK_RADIUS = 15
 
-def process_hands(img):
+# hand slots: MediaPipe's hand order isn't stable, so each hand is matched to
+# the slot whose wrist was nearest last frame, and touch state is keyed by slot
+MAX_MATCH = 150.0       # px a wrist may move between frames and keep its slot
+_slot_wrists = np.zeros((MAX_HANDS, 2), np.int64)
+_slot_seen = np.zeros(MAX_HANDS, bool)
+
+# last_landmarks of every hand as click targets (key = hand * 21 + landmark),
+# rebuilt on the first click after they changed
+landmark_index = GridIndex(cell_size=32)
+_index_stale = False
+
+
+def set_backend(new_backend):
+    """Replaces the inference backend (e.g. inference.ProcessInference)."""
+    global backend
+    if backend is not None:
+        backend.close()
+    backend = new_backend
+
+
+def _roi_box(h, w):
+    """Padded box around last frame's hands, or the whole frame."""
+    if not roi_mode or not last_boxes:
+        return (0, 0, w, h)
+
+    x0 = min(b[0] for b in last_boxes)
+    y0 = min(b[1] for b in last_boxes)
+    x1 = max(b[2] for b in last_boxes)
+    y1 = max(b[3] for b in last_boxes)
+    pad = roi_padding * max(x1 - x0, y1 - y0)
+
+    return (max(0, int(x0 - pad)), max(0, int(y0 - pad)),
+            min(w, int(x1 + pad) + 1), min(h, int(y1 + pad) + 1))
+
+
+def _detect_in_box(img, box):
+    """
+    Runs the backend on img[box], downscaled to infer_width, and returns
+    float (21, 2) arrays in full-frame pixel coordinates.
     """
-    Processes the frame with MediaPipe, updates last_landmarks,
-    and returns a list of (x,y) points that correspond to whichever
-    landmark is currently selected.
+    x0, y0, x1, y1 = box
+    crop = img[y0:y1, x0:x1]
+    cw, ch = x1 - x0, y1 - y0
+
+    if infer_width and cw > infer_width:
+        size = (infer_width, max(1, round(ch * infer_width / cw)))
+        buf = getattr(_scratch, "resized", None)
+        if buf is None or buf.shape[:2] != (size[1], size[0]):
+            buf = _scratch.resized = np.empty((size[1], size[0], 3), np.uint8)
+        cv2.resize(crop, size, dst=buf, interpolation=cv2.INTER_LINEAR)
+        crop = buf
+
+    # landmarks are normalized to the crop, so scaling cancels out and
+    # only the crop's size and offset are needed to project them back.
+    # The backend's array is ours until its next call, so scale in place.
+    found = backend.detect(crop)
+    found[..., 0] *= cw
+    found[..., 0] += x0
+    found[..., 1] *= ch
+    found[..., 1] += y0
+    return found
+
+
+def detect_hands(img, out=None):
     """
-    global last_landmarks, selected_landmark, hands
+    Runs MediaPipe on a BGR frame and returns an int32 (hands, 21, 2)
+    array of pixel points. With `out` (a (MAX_HANDS, 21, 2) int32 array,
+    e.g. a pooled Frame's landmarks) the points are written into it and
+    a view of the filled rows is returned, so nothing is allocated per
+    frame. Does not draw anything, so it can run on a different thread
+    than the one drawing the frame.
+    """
+    global last_boxes, roi_fallbacks
+    if out is None:
+        out = np.zeros((MAX_HANDS, 21, 2), np.int32)
+    if backend is None:
+        return out[:0]
+
+    h, w, c = img.shape
+    full = (0, 0, w, h)
+
+    box = _roi_box(h, w)
+    found = _detect_in_box(img, box)
+    if not len(found) and box != full:
+        # tracking lost: search the whole frame again
+        roi_fallbacks += 1
+        found = _detect_in_box(img, full)
+
+    found = found[:len(out)]
+    if roi_mode:
+        last_boxes = [(hand[:, 0].min(), hand[:, 1].min(),
+                       hand[:, 0].max(), hand[:, 1].max()) for hand in found]
 
-    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb)
+    # truncate like int() did
+    detected = out[:len(found)]
+    np.copyto(detected, found, casting="unsafe")
+    return detected
 
-    last_landmarks = []  
-    selected_points = []
 
-    if results.multi_hand_landmarks:
-        h, w, c = img.shape
+def active_landmarks():
+    """int array of the landmarks that play the nodes."""
+    if touch_landmarks is None:
+        return np.array([selected_landmark] if 0 <= selected_landmark < 21 else [], np.intp)
+    return np.asarray(touch_landmarks, np.intp)
 
-        for handLms in results.multi_hand_landmarks:
-            temp = []
 
-            for lm in handLms.landmark:
-                lx, ly = int(lm.x * w), int(lm.y * h)
-                temp.append((lx, ly))
-                cv2.circle(img, (lx, ly), 4, (0, 0, 255), -1)
+def match_slots(detected):
+    """
+    Slot of each detected hand: the slot whose wrist was nearest last
+    frame (within MAX_MATCH, closest pairs first), else a free slot.
+    """
+    wrists = detected[:, 0].astype(np.int64)
+    d = ((wrists[:, None] - _slot_wrists[None]) ** 2).sum(axis=2).astype(np.float64)
+    d[:, ~_slot_seen] = np.inf
+    nearest = d.argmin(axis=1)
+    if (d[np.arange(len(d)), nearest] < MAX_MATCH ** 2).all() and \
+            len(set(nearest.tolist())) == len(nearest):
+        # the usual case: every hand is still nearest its own slot
+        slots = nearest
+    else:
+        slots = np.full(len(detected), -1, np.intp)
+        taken = np.zeros(MAX_HANDS, bool)
+        for k in np.argsort(d, axis=None).tolist():
+            h, s = divmod(k, MAX_HANDS)
+            if d[h, s] >= MAX_MATCH ** 2:
+                break
+            if slots[h] < 0 and not taken[s]:
+                slots[h] = s
+                taken[s] = True
+        for h in np.flatnonzero(slots < 0).tolist():
+            s = int(np.flatnonzero(~taken)[0])
+            slots[h] = s
+            taken[s] = True
+
+    _slot_seen[:] = False
+    _slot_seen[slots] = True
+    _slot_wrists[slots] = wrists
+    return slots
+
+
+def touch_keys(slots, landmarks):
+    """Touch state key of each (hand, landmark) pair, hand-major: slot * 21 + landmark."""
+    return (np.asarray(slots, np.intp)[:, None] * 21 + landmarks[None]).ravel()
+
+
+def draw_hands(img, detected):
+    """
+    Draws the hands returned by detect_hands, updates last_landmarks and
+    returns (points, keys): int32 (n, 2) positions of the active landmarks
+    of every hand, and the touch state key of each (see touch_keys), by
+    hand slot, so a fingertip in a node stays the same touch when
+    MediaPipe swaps the hands.
+    """
+    global last_landmarks, _index_stale
+
+    active = active_landmarks()
+    renderer.draw(img, detected, active)
+    points = detected[:, active].reshape(-1, 2)
+    keys = touch_keys(match_slots(detected[:MAX_HANDS]), active)
 
-            last_landmarks = temp.copy()
+    # copy: `detected` may be a pooled buffer that gets reused
+    n = min(len(detected), MAX_HANDS)
+    np.copyto(_last_hands[:n], detected[:n])
+    last_landmarks = _last_hands[:n]
+    _index_stale = True
 
-            if 0 <= selected_landmark < len(last_landmarks):
-                sx, sy = last_landmarks[selected_landmark]
-                selected_points.append((sx, sy))
-                cv2.circle(img, (sx, sy), 10, (0, 255, 255), 2)
+    return points, keys
 
-            mp_draw.draw_landmarks(img, handLms, mp_hands.HAND_CONNECTIONS)
 
-    return selected_points
+def process_hands(img):
+    """
+    Processes the frame with MediaPipe, updates last_landmarks and
+    returns the active landmark points and keys, as draw_hands.
+    """
+    return draw_hands(img, detect_hands(img))
 
 
 def select_landmark(x, y):
-    """Called when user clicks near any red landmark."""
-    global last_landmarks, selected_landmark
-
-    for idx, (lx, ly) in enumerate(last_landmarks):
-        dist = ((x - lx)**2 + (y - ly)**2)**0.5
-        if dist < 15:
-            selected_landmark = idx
-            print("Selected landmark:", idx)
+    """
+    Called when the user clicks near a red landmark of any hand: selects
+    it, or with touch_landmarks set, adds it to or removes it from them.
+    """
+    global selected_landmark, touch_landmarks, _index_stale
+
+    flat = last_landmarks.reshape(-1, 2)
+    if _index_stale:
+        landmark_index.clear()
+        for key, (lx, ly) in enumerate(flat.tolist()):
+            landmark_index.insert(key, lx, ly, LANDMARK_PICK_RADIUS)
+        _index_stale = False
+
+    for key in landmark_index.query(x, y):
+        lx, ly = flat[key].tolist()
+        if (x - lx)**2 + (y - ly)**2 < LANDMARK_PICK_RADIUS**2:
+            idx = key % 21
+            if touch_landmarks is None:
+                selected_landmark = idx
+                print("Selected landmark:", idx)
+            elif idx in touch_landmarks:
+                if len(touch_landmarks) > 1:
+                    touch_landmarks = [i for i in touch_landmarks if i != idx]
+                    print("Touch landmarks:", touch_landmarks)
+            else:
+                touch_landmarks = sorted(touch_landmarks + [idx])
+                print("Touch landmarks:", touch_landmarks)
             return True
 
     return False
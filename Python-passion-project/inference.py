@@ -0,0 +1,285 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from profiler import profiler
+
+
+def results_to_array(results, out=None):
+    """
+    Converts MediaPipe results to a float32 (hands, 21, 2) array of normalized x,y.
+    With `out` (a (max_hands, 21, 2) float32 array) the landmarks are written
+    into it and a view of the filled rows is returned.
+    """
+    if not results.multi_hand_landmarks:
+        return np.zeros((0, 21, 2), np.float32) if out is None else out[:0]
+    if out is None:
+        return np.array([[(lm.x, lm.y) for lm in handLms.landmark]
+                         for handLms in results.multi_hand_landmarks], np.float32)
+    n = min(len(results.multi_hand_landmarks), len(out))
+    for hand, handLms in zip(out, results.multi_hand_landmarks[:n]):
+        for row, lm in zip(hand, handLms.landmark):
+            row[0] = lm.x
+            row[1] = lm.y
+    return out[:n]
+
+
+class InProcessInference:
+    """
+    Runs MediaPipe Hands in this interpreter (the original behaviour).
+
+    The RGB copy and the landmark array are reused between calls, so the
+    array detect() returns is only valid until the next call.
+    """
+
+    def __init__(self, max_num_hands=2, model_complexity=1):
+        import mediapipe as mp
+        self._mp_hands = mp.solutions.hands
+        self.max_num_hands = max_num_hands
+        self.model_complexity = model_complexity
+        self.hands = self._mp_hands.Hands(max_num_hands=max_num_hands,
+                                          model_complexity=model_complexity)
+        self._rgb = None
+        self._out = np.zeros((max_num_hands, 21, 2), np.float32)
+        self._lock = threading.Lock()
+        self._configure_lock = threading.Lock()
+
+    def configure(self, max_num_hands=None, model_complexity=None):
+        """
+        Swaps in a model with new settings. The new model is built before
+        taking the lock, so detect() keeps running on the old one meanwhile.
+        """
+        with self._configure_lock:
+            max_num_hands = max_num_hands or self.max_num_hands
+            if model_complexity is None:
+                model_complexity = self.model_complexity
+            hands = self._mp_hands.Hands(max_num_hands=max_num_hands,
+                                         model_complexity=model_complexity)
+            with self._lock:
+                old, self.hands = self.hands, hands
+                self.max_num_hands = max_num_hands
+                self.model_complexity = model_complexity
+                if len(self._out) < max_num_hands:
+                    self._out = np.zeros((max_num_hands, 21, 2), np.float32)
+            old.close()
+
+    def detect(self, img):
+        with self._lock:
+            if self._rgb is None or self._rgb.shape != img.shape:
+                self._rgb = np.empty(img.shape, np.uint8)
+            with profiler.stage("rgb"):
+                cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            with profiler.stage("process"):
+                results = self.hands.process(self._rgb)
+            with profiler.stage("landmarks"):
+                return results_to_array(results, self._out)
+
+    def close(self):
+        with self._lock:
+            self.hands.close()
+
+
+# -----------------------------
+# OUT-OF-PROCESS INFERENCE
+# -----------------------------
+class FrameRing:
+    """
+    Fixed number of equally sized frame slots in one shared memory block.
+    A frame of any shape fits as long as it is no larger than slot_bytes.
+    """
+
+    def __init__(self, slots, slot_bytes):
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = queue.Queue()
+        for i in range(slots):
+            self.free.put(i)
+        self.slots = slots
+
+    def write(self, slot, img):
+        """Copies img into a slot and returns its byte offset."""
+        offset = slot * self.slot_bytes
+        view = np.ndarray(img.shape, np.uint8, buffer=self.shm.buf, offset=offset)
+        np.copyto(view, img)
+        del view
+        return offset
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _worker_main(task_q, result_q, max_num_hands, model_complexity):
+    """Worker process: reads frames from the ring, sends back landmark arrays."""
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(max_num_hands=max_num_hands,
+                                     model_complexity=model_complexity)
+    # model loading can take seconds; tell the parent when we're ready
+    result_q.put((-1, None))
+
+    attached = None
+    rgb = None
+
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+
+        if task[0] == "configure":
+            _, max_num_hands, model_complexity = task
+            hands.close()
+            hands = mp.solutions.hands.Hands(max_num_hands=max_num_hands,
+                                             model_complexity=model_complexity)
+            # restarts the parent's hang timer like the first load
+            result_q.put((-1, None))
+            continue
+
+        seq, shm_name, offset, shape = task
+
+        if attached is None or attached.name != shm_name:
+            if attached is not None:
+                attached.close()
+            attached = shared_memory.SharedMemory(name=shm_name)
+
+        frame = np.ndarray(shape, np.uint8, buffer=attached.buf, offset=offset)
+        if rgb is None or rgb.shape != frame.shape:
+            rgb = np.empty(shape, np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        del frame
+
+        result_q.put((seq, results_to_array(hands.process(rgb))))
+
+    hands.close()
+    if attached is not None:
+        attached.close()
+
+
+class _Worker:
+    def __init__(self, ctx, max_num_hands, model_complexity):
+        self.task_q = ctx.Queue()
+        self.result_q = ctx.Queue()
+        self.proc = ctx.Process(target=_worker_main,
+                                args=(self.task_q, self.result_q, max_num_hands,
+                                      model_complexity),
+                                daemon=True)
+        self.ready = False
+        self.proc.start()
+
+    def stop(self):
+        if self.proc.is_alive():
+            self.task_q.put(None)
+            self.proc.join(timeout=1.0)
+        if self.proc.is_alive():
+            self.proc.kill()
+
+
+class ProcessInference:
+    """
+    Runs MediaPipe Hands in worker processes so the landmark loops and
+    drawing in this process don't compete with it for the GIL.
+
+    Frames go through a shared memory ring (no pickling); only the small
+    (hands, 21, 2) landmark array comes back. detect() is thread safe:
+    with several workers, concurrent callers are spread across them, so
+    two inference threads alternate frames between two workers.
+    A worker that dies, or hangs once its model is loaded, is restarted
+    and that frame returns no hands.
+    """
+
+    def __init__(self, workers=1, max_num_hands=2, model_complexity=1, timeout=5.0):
+        self.max_num_hands = max_num_hands
+        self.model_complexity = model_complexity
+        self.timeout = timeout
+        self.restarts = 0
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(self._ctx, max_num_hands, model_complexity)
+                         for _ in range(workers)]
+        self._idle = queue.Queue()
+        for i in range(workers):
+            self._idle.put(i)
+
+        self._seq = itertools.count()
+        self._ring = None
+        self._ring_lock = threading.Lock()
+
+    def configure(self, max_num_hands=None, model_complexity=None):
+        """
+        Has every worker swap in a model with new settings. Each worker
+        picks this up after the frame it is on, so no frame is lost.
+        """
+        self.max_num_hands = max_num_hands or self.max_num_hands
+        if model_complexity is not None:
+            self.model_complexity = model_complexity
+        for w in self._workers:
+            w.task_q.put(("configure", self.max_num_hands, self.model_complexity))
+
+    def _acquire_slot(self, nbytes):
+        with self._ring_lock:
+            if self._ring is None or self._ring.slot_bytes < nbytes:
+                old = self._ring
+                if old is not None:
+                    # wait for every in-flight frame, then swap in a bigger ring
+                    for _ in range(old.slots):
+                        old.free.get()
+                    old.close()
+                self._ring = FrameRing(len(self._workers) + 1, nbytes)
+            ring = self._ring
+            return ring, ring.free.get()
+
+    def detect(self, img):
+        img = np.ascontiguousarray(img)
+        idx = self._idle.get()
+        ring, slot = self._acquire_slot(img.nbytes)
+        try:
+            offset = ring.write(slot, img)
+            seq = next(self._seq)
+            self._workers[idx].task_q.put((seq, ring.shm.name, offset, img.shape))
+            # colour conversion and landmark extraction happen in the worker
+            with profiler.stage("process"):
+                return self._wait(idx, seq)
+        finally:
+            ring.free.put(slot)
+            self._idle.put(idx)
+
+    def _wait(self, idx, seq):
+        worker = self._workers[idx]
+        deadline = time.perf_counter() + self.timeout
+
+        while True:
+            try:
+                rseq, landmarks = worker.result_q.get(timeout=0.1)
+            except queue.Empty:
+                hung = worker.ready and time.perf_counter() > deadline
+                if hung or not worker.proc.is_alive():
+                    self._restart(idx)
+                    return np.zeros((0, 21, 2), np.float32)
+                continue
+
+            if rseq == -1:
+                worker.ready = True
+                deadline = time.perf_counter() + self.timeout
+                continue
+
+            if rseq == seq:
+                return landmarks
+
+    def _restart(self, idx):
+        print("Inference worker", idx, "restarting")
+        self._workers[idx].stop()
+        self._workers[idx] = _Worker(self._ctx, self.max_num_hands, self.model_complexity)
+        self.restarts += 1
+
+    def close(self):
+        for w in self._workers:
+            w.stop()
+        with self._ring_lock:
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
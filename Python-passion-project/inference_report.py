@@ -0,0 +1,97 @@
+"""
+Compares inference modes on the same frames:
+
+    python inference_report.py --video clip.mp4
+    python inference_report.py --frames 300        (records from the camera first)
+
+Full-resolution inference is the reference. For every mode it prints
+throughput and how far its landmarks are from the reference, in pixels.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import hand_tracking
+from inference import InProcessInference
+
+MODES = [
+    ("full frame", 0, False),
+    ("320px", 320, False),
+    ("roi", 0, True),
+    ("roi + 320px", 320, True),
+]
+
+
+def read_frames(source, limit):
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < limit:
+        success, img = cap.read()
+        if not success:
+            break
+        frames.append(cv2.flip(img, 1))
+    cap.release()
+    return frames
+
+
+def run_mode(frames, width, roi):
+    """Runs detect_hands over all frames with a fresh model. Returns (results, seconds)."""
+    hand_tracking.set_backend(InProcessInference(max_num_hands=2))
+    hand_tracking.infer_width = width
+    hand_tracking.roi_mode = roi
+    hand_tracking.last_boxes = []
+    hand_tracking.roi_fallbacks = 0
+
+    results = []
+    start = time.perf_counter()
+    for img in frames:
+        results.append([np.array(hand, np.float32) for hand in hand_tracking.detect_hands(img)])
+    return results, time.perf_counter() - start
+
+
+def landmark_error(reference, results):
+    """Mean landmark distance (px) over hands found in both, matched by wrist, and recall."""
+    errors = []
+    ref_hands = 0
+    for ref, got in zip(reference, results):
+        ref_hands += len(ref)
+        for hand in ref:
+            if not got:
+                continue
+            match = min(got, key=lambda g: np.linalg.norm(g[0] - hand[0]))
+            errors.append(np.linalg.norm(match - hand, axis=1).mean())
+
+    recall = len(errors) / ref_hands if ref_hands else 1.0
+    return (float(np.mean(errors)) if errors else 0.0), recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference resolution / ROI report")
+    parser.add_argument("--video", help="video file (default: camera 0)")
+    parser.add_argument("--frames", type=int, default=300)
+    opts = parser.parse_args()
+
+    frames = read_frames(opts.video if opts.video else 0, opts.frames)
+    if not frames:
+        print("No frames read")
+        return
+
+    reference = None
+    print(f"{len(frames)} frames at {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'mode':<14}{'fps':>8}{'err px':>9}{'recall':>8}{'fallbacks':>11}")
+
+    for name, width, roi in MODES:
+        results, seconds = run_mode(frames, width, roi)
+        if reference is None:
+            reference = results
+        err, recall = landmark_error(reference, results)
+        print(f"{name:<14}{len(frames) / seconds:8.1f}{err:9.2f}{recall:8.2f}"
+              f"{hand_tracking.roi_fallbacks:11d}")
+
+    hand_tracking.set_backend(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,146 @@
+import time
+LAUNCH = time.perf_counter()
+
+import argparse
+import os
+import threading
+
 import cv2
-from hand_tracking import process_hands, select_landmark
-from nodes import nodes, node_x, node_y, node_radius
-from nodes import handle_blue_collisions, handle_green_collision
-from ui import draw_dropdown, ui_click, current_effect
+import numpy as np
+import ui
+import effects
+import hand_tracking
+from hand_tracking import detect_hands, draw_hands, select_landmark
+from nodes import nodes, handle_collisions, audio
+from audio_engine import NullOutput, FileOutput
+from ui import draw_ui, ui_click
+from overlay import TextWidget
+from effects import EFFECTS, clear_effects
+from pipeline import Pipeline, FpsCounter, format_fps
+from inference import InProcessInference, ProcessInference
+from flow_tracker import FlowTracker
+from frame_pool import FramePool, camera_shape, detect_frame, mirror_frame
+from startup import Startup
+from skeleton import LODS, FINGERTIPS
+from profiler import profiler, ProfilerHud
+from governor import Governor
+from motion_filter import HandMotion
+from recording import SessionRecorder, PerformanceRecorder
+from gestures import GestureTracker, GestureControls
+from scene import load_scene, apply_scene, save_scene, SceneWatcher
+
+parser = argparse.ArgumentParser(description="Hand tracking music nodes")
+parser.add_argument("--pipeline", action="store_true",
+                    help="run capture, inference and render on separate threads")
+parser.add_argument("--fps", action="store_true",
+                    help="print per-stage FPS once per second")
+parser.add_argument("--inference-workers", type=int, default=0,
+                    help="run MediaPipe in this many worker processes "
+                         "(0 = in this process; >1 needs --pipeline to overlap frames)")
+parser.add_argument("--infer-width", type=int, default=0,
+                    help="downscale frames to this width before inference (0 = full size)")
+parser.add_argument("--roi", action="store_true",
+                    help="run inference on a crop around last frame's hands")
+parser.add_argument("--detect-every", type=int, default=1,
+                    help="run MediaPipe every N frames and track landmarks with "
+                         "optical flow in between (1 = every frame)")
+parser.add_argument("--touch-landmarks", default="selected",
+                    help="landmarks that play the nodes on every hand: 'selected' (the "
+                         "clicked one), 'tips' (all five fingertips) or indices like 4,8; "
+                         "with a set, clicking a landmark adds or removes it")
+parser.add_argument("--mirror", choices=("pixels", "landmarks"), default="pixels",
+                    help="mirror the camera image before inference, or run inference "
+                         "on the camera image and mirror the landmarks instead")
+parser.add_argument("--skeleton", choices=LODS, default="full",
+                    help="hand drawing detail: full skeleton, fingertips only, or off")
+parser.add_argument("--profile", action="store_true",
+                    help="time each frame stage and show p50/p95/p99 on screen")
+parser.add_argument("--profile-out",
+                    help="also record every stage and write them here at exit "
+                         "(.json = Chrome trace, otherwise CSV); implies --profile")
+parser.add_argument("--target-fps", type=float, default=0,
+                    help="lower quality step by step (inference size, model, hands, "
+                         "particles, skeleton, glow) to hold this frame rate; 0 = off")
+parser.add_argument("--predict", action="store_true",
+                    help="smooth landmarks and play nodes where the fingertip is now, "
+                         "extrapolated over the measured capture-to-render delay, "
+                         "testing the whole path it moved along since last frame")
+parser.add_argument("--predict-extra-ms", type=float, default=0.0,
+                    help="look this much further ahead than the measured delay "
+                         "(camera and display latency aren't measured)")
+parser.add_argument("--scene", metavar="FILE",
+                    help="load the nodes from this scene file (JSON, see scene.py), reload "
+                         "them when it changes, and save the layout to it with 's'")
+parser.add_argument("--scene-cache", metavar="DIR",
+                    help="where compiled scenes are cached (default: .scene-cache next to "
+                         "the scene file)")
+parser.add_argument("--effect-stack", action="append", default=[], metavar="EFFECTS",
+                    help="add effects that start together to the dropdown, "
+                         "e.g. pulse+glow (repeatable)")
+parser.add_argument("--gestures", action="store_true",
+                    help="control the app with hand gestures: swipe to change the "
+                         "effect, pinch and move up or down for volume, fist to mute, "
+                         "open palm to unmute")
+parser.add_argument("--record", metavar="DIR",
+                    help="record frames, landmarks and node touches into DIR "
+                         "for replay.py")
+parser.add_argument("--record-video", choices=("mjpg", "none"), default="mjpg",
+                    help="with --record, also save the frames (none = landmarks only)")
+parser.add_argument("--capture", metavar="DIR",
+                    help="record the performance into DIR: the video as shown, the "
+                         "notes mixed down to a WAV in step with it, and node touches")
+parser.add_argument("--capture-fps", type=float, default=30.0,
+                    help="frame rate of the --capture video; the loop's frames are "
+                         "repeated or skipped to keep it in step with the audio")
+parser.add_argument("--capture-buffers", type=int, default=8,
+                    help="frames that can wait for the --capture encoder before "
+                         "new ones are dropped")
+parser.add_argument("--audio-buffer", type=int, default=256,
+                    help="audio block size in frames (smaller = lower latency)")
+parser.add_argument("--audio-voices", type=int, default=16,
+                    help="notes that can sound at once before the oldest is cut")
+parser.add_argument("--audio-output", default="device",
+                    help="'device', 'null', or a .wav path to write the mix to")
+parser.add_argument("--profile-startup", action="store_true",
+                    help="print how long each startup step took")
+args = None
+startup = None
+
+# frame -> hands function used by both loops
+detect = detect_hands
+
+# latest per-stage FPS line, shown on screen with --fps
+fps_text = ""
 
-# mouse dragging
+# mouse dragging: row of the dragged node
 drag_index = None
 
+# MediaPipe settings; the governor may lower them while running
+model_settings = {"max_num_hands": 2, "model_complexity": 1}
+
+# set with --target-fps
+governor = None
+
+# set with --predict
+motion = None
+# running average of capture -> render time in seconds
+pipeline_delay = 0.0
+
+# set with --scene
+scene_watcher = None
+
+# set with --gestures
+gestures = None
+gesture_controls = None
+
+# set with --record
+recorder = None
+
+# set with --capture
+capture = None
+
 def mouse_event(event, x, y, flags, param):
-    global drag_index, node_x, node_y
+    global drag_index
 
     # dropdown UI
     if event == cv2.EVENT_LBUTTONDOWN:
@@ -17,57 +149,390 @@ def mouse_event(event, x, y, flags, param):
 
     # node dragging
     if event == cv2.EVENT_LBUTTONDOWN:
-
-        # check blue nodes
-        for i, node in enumerate(nodes):
-            if ((x-node["x"])**2 + (y-node["y"])**2)**0.5 < node["radius"]:
-                drag_index = i
-                return
-
-        # check green
-        if ((x-node_x)**2 + (y-node_y)**2)**0.5 < node_radius:
-            drag_index = "main"
+        drag_index = nodes.hit_test(x, y)
+        if drag_index is not None:
             return
 
         select_landmark(x, y)
 
     elif event == cv2.EVENT_MOUSEMOVE:
-        if drag_index == "main":
-            node_x = x
-            node_y = y
-        elif isinstance(drag_index, int):
-            nodes[drag_index]["x"] = x
-            nodes[drag_index]["y"] = y
+        if drag_index is not None:
+            nodes.move(drag_index, x, y)
 
     elif event == cv2.EVENT_LBUTTONUP:
         drag_index = None
 
 
-cv2.namedWindow("Hand Tracking")
-cv2.setMouseCallback("Hand Tracking", mouse_event)
+def load_scene_file(path):
+    """Replaces the nodes with a scene file's; keeps the current ones if it can't be used."""
+    global drag_index
+    start = time.perf_counter()
+    try:
+        scene = load_scene(path, args.scene_cache)
+        if recorder is not None and len(scene) != nodes.n:
+            print(f"scene {path} has {len(scene)} nodes, the recording {nodes.n}: "
+                  "not loaded while recording")
+            return False
+        apply_scene(scene, nodes, audio)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"can't load scene {path}: {e}")
+        return False
 
-cap = cv2.VideoCapture(0)
+    # running effects play on rows that may now be other nodes
+    clear_effects()
+    try:
+        ui.add_effect_option(scene.effect)
+        ui.current_effect = scene.effect
+    except ValueError as e:
+        print(f"scene {path}: {e}")
+    drag_index = None
+    print(f"scene {path}: {nodes.n} nodes in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return True
 
-while True:
-    success, img = cap.read()
-    if not success:
-        break
 
-    img = cv2.flip(img, 1)
+def save_scene_file():
+    path = args.scene or "scene.json"
+    count = save_scene(path, nodes, audio.bank, ui.current_effect)
+    if scene_watcher is not None:
+        scene_watcher.saved()
+    print(f"saved {count} nodes to {path}")
 
-    # get selected fingertip for each hand
-    hand_points = process_hands(img)
 
-    # collisions + effects
-    handle_blue_collisions(img, hand_points, current_effect)
-    handle_green_collision(img, hand_points, current_effect)
+def draw_frame(img, detected, captured_at, now=None):
+    """
+    Draws hands, nodes, effects and UI onto img. `now` is the render time
+    (perf_counter); replay.py passes the recorded one. Returns the node
+    rows touched this frame.
+    """
+    global pipeline_delay
+    delay = (time.perf_counter() if now is None else now) - captured_at
+
+    if recorder is not None:
+        # before anything is drawn onto img or the landmarks are smoothed
+        recorder.add_frame(img, detected, captured_at, delay,
+                           hand_tracking.selected_landmark, ui.current_effect,
+                           np.stack([nodes.x[:nodes.n], nodes.y[:nodes.n]], axis=1),
+                           hand_tracking.active_landmarks())
+
+    pipeline_delay += 0.1 * (delay - pipeline_delay)
 
+    if motion is not None:
+        with profiler.stage("predict"):
+            motion.update(detected, captured_at)
+
+    if gestures is not None:
+        with profiler.stage("gestures"):
+            gesture_controls.apply(gestures, gestures.update(detected, captured_at))
+
+    # active landmarks of every hand
+    with profiler.stage("skeleton"):
+        hand_points, keys = draw_hands(img, detected)
+
+    # touch where the fingertips are by now, along the path since last frame
+    previous_points = near = None
+    if motion is not None:
+        lead = pipeline_delay + args.predict_extra_ms / 1000
+        hand_points, previous_points, keys, near = motion.touch_points(
+            hand_tracking.active_landmarks(), lead)
+
+    # collisions + effects
+    started = handle_collisions(img, hand_points, ui.current_effect, previous_points, keys,
+                                near, motion.margin if motion is not None else 0)
     # UI
-    draw_dropdown(img)
+    with profiler.stage("ui"):
+        draw_ui(img)
+
+    if recorder is not None:
+        recorder.add_events(started, ui.current_effect)
+    return started
+
+
+def render(img, detected, captured_at):
+    """Draws the frame onto img and shows it. Returns False to quit."""
+    if scene_watcher is not None:
+        scene_watcher.poll()
+    started = draw_frame(img, detected, captured_at)
+
+    if capture is not None:
+        with profiler.stage("record"):
+            now = time.perf_counter()
+            capture.add_frame(img, now)
+            capture.add_events(started, ui.current_effect, now)
+
+    with profiler.stage("show"):
+        cv2.imshow("Hand Tracking", img)
+        key = cv2.waitKey(1) & 0xFF
+    if key == ord('s'):
+        save_scene_file()
+
+    if args.profile_startup and not startup.reported:
+        if "first frame" not in startup.timings:
+            startup.mark("first frame")
+        if startup.all_ready():
+            print(startup.report())
+            startup.reported = True
+
+    return key != ord('q')
+
+
+def report_fps(counters, last_report):
+    """Prints and shows the counters once per second. Returns the new report time."""
+    global fps_text
+    now = time.perf_counter()
+    if not args.fps or now - last_report < 1.0:
+        return last_report
+    for c in counters:
+        c.sample()
+    fps_text = format_fps(counters)
+    print(fps_text)
+    return now
+
+
+def run_serial(cap):
+    # every stage runs once per loop, so one counter covers all of them
+    loop_fps = FpsCounter("serial")
+    last_report = time.perf_counter()
+    landmarks_mirrored = args.mirror == "landmarks"
+    pool = FramePool(count=1, shape=camera_shape(cap))
+
+    while True:
+        with profiler.stage("frame"):
+            frame = pool.read(cap, pool.acquire(), mirror_pixels=not landmarks_mirrored)
+            if frame is None:
+                break
+
+            # time spent waiting for the camera isn't ours to save
+            start = time.perf_counter()
+            hands = detect_frame(detect, frame, landmarks_mirrored)
+            if landmarks_mirrored:
+                mirror_frame(frame)
+
+            keep_going = render(frame.img, hands, frame.t)
+            pool.release(frame)
+            if governor is not None:
+                governor.tick(time.perf_counter() - start)
+        if not keep_going:
+            break
+
+        loop_fps.tick()
+        last_report = report_fps([loop_fps], last_report)
+
+
+def run_pipelined(cap):
+    pipeline = Pipeline(cap, detect,
+                        inference_threads=max(1, args.inference_workers),
+                        mirror_landmarks=args.mirror == "landmarks",
+                        shape=camera_shape(cap))
+    pipeline.start()
+    last_report = time.perf_counter()
+
+    try:
+        while pipeline.running:
+            item = pipeline.next_result()
+            if item is None:
+                # keep the window responsive while waiting for a frame
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+
+            img, detected, captured_at = item
+            start = time.perf_counter()
+            with profiler.stage("frame"):
+                keep_going = render(img, detected, captured_at)
+            if not keep_going:
+                break
+            if governor is not None:
+                # the slower of the two stages sets the frame rate
+                busy = max(time.perf_counter() - start,
+                           pipeline.detect_time / pipeline.inference_threads)
+                governor.tick(busy)
+
+            last_report = report_fps(pipeline.counters(), last_report)
+    finally:
+        pipeline.stop()
+        if args.fps:
+            print("dropped stale frames:", pipeline.dropped())
+            print(pipeline.pool.stats())
+
+
+def open_camera():
+    cap = cv2.VideoCapture(0)
+    if args.pipeline:
+        # ask the driver not to buffer frames; the capture thread keeps the newest
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def load_model():
+    if args.inference_workers > 0:
+        new_backend = ProcessInference(workers=args.inference_workers, **model_settings)
+    else:
+        new_backend = InProcessInference(**model_settings)
+    # the first inference is much slower than the rest; pay for it here
+    new_backend.detect(np.zeros((240, 320, 3), np.uint8))
+    hand_tracking.set_backend(new_backend)
+
+
+def set_model(**settings):
+    model_settings.update(settings)
+    if hand_tracking.backend is not None:
+        # building a model takes a while; don't stall the frame for it
+        threading.Thread(target=hand_tracking.backend.configure, kwargs=settings,
+                         daemon=True).start()
+
+
+def quality_governor():
+    """Governor over every quality setting, in the order they are given up."""
+    knobs = {
+        "infer_width": lambda v: setattr(hand_tracking, "infer_width", v),
+        "model_complexity": lambda v: set_model(model_complexity=v),
+        "max_num_hands": lambda v: set_model(max_num_hands=v),
+        "particles": lambda v: setattr(effects.particles, "limit", v),
+        "skeleton": lambda v: setattr(hand_tracking.renderer, "lod", v),
+        "glow": lambda v: setattr(effects, "glow_quality", v),
+    }
+    base = {
+        "infer_width": args.infer_width,
+        "model_complexity": model_settings["model_complexity"],
+        "max_num_hands": model_settings["max_num_hands"],
+        "particles": effects.particles.limit,
+        "skeleton": args.skeleton,
+        "glow": effects.glow_quality,
+    }
+    steps = [("infer_width", w) for w in (640, 480)
+             if not args.infer_width or w < args.infer_width]
+    steps += [("model_complexity", 0), ("max_num_hands", 1), ("particles", 8192)]
+    if args.skeleton == "full":
+        steps.append(("skeleton", "tips"))
+    steps.append(("glow", "ring"))
+    if not args.infer_width or args.infer_width > 320:
+        steps.append(("infer_width", 320))
+    steps.append(("particles", 1024))
+    return Governor(args.target_fps, knobs, base, steps)
+
+
+def apply_settings():
+    """Applies the command line settings that shape each frame (not camera or model)."""
+    global detect, governor, motion, recorder, capture, gestures, gesture_controls, scene_watcher
+    hand_tracking.infer_width = args.infer_width
+    hand_tracking.roi_mode = args.roi
+    hand_tracking.renderer.lod = args.skeleton
+    if args.touch_landmarks == "tips":
+        hand_tracking.touch_landmarks = list(FINGERTIPS)
+    elif args.touch_landmarks != "selected":
+        hand_tracking.touch_landmarks = sorted(int(i) for i in args.touch_landmarks.split(","))
+    for mode in args.effect_stack:
+        try:
+            ui.add_effect_option(mode)
+        except ValueError as e:
+            parser.error(f"--effect-stack {mode}: {e}")
+    if args.scene:
+        if os.path.exists(args.scene):
+            load_scene_file(args.scene)
+        else:
+            print(f"{args.scene} doesn't exist yet; press 's' to save the layout to it")
+        scene_watcher = SceneWatcher(args.scene, load_scene_file)
+    if args.detect_every > 1:
+        # flow tracking needs consecutive frames, so it serializes inference threads
+        detect = FlowTracker(detect_hands, every=args.detect_every)
+
+    if args.target_fps > 0:
+        governor = quality_governor()
+
+    if args.predict:
+        motion = HandMotion()
+
+    if args.gestures:
+        gestures = GestureTracker()
+        gesture_controls = GestureControls(audio)
+        ui.overlay.add(TextWidget(ui.dd_x, ui.dd_y + 160,
+                                  lambda: gesture_controls.text(gestures)))
+
+    if args.record:
+        recorder = SessionRecorder(args.record, video=args.record_video != "none")
+
+    if args.capture:
+        capture = PerformanceRecorder(args.capture, audio, fps=args.capture_fps,
+                                      buffers=args.capture_buffers)
+
+    if args.profile or args.profile_out:
+        profiler.enable(trace=bool(args.profile_out))
+        ui.overlay.add(ProfilerHud(ui.dd_x, ui.dd_y + 200, profiler))
+
+    if args.fps:
+        ui.overlay.add(TextWidget(ui.dd_x + ui.dd_width + 10, ui.dd_y, lambda: fps_text))
+
+
+def start_audio():
+    audio.configure(block_size=args.audio_buffer, voices=args.audio_voices)
+    # render the notes now, not on the first touches
+    audio.preload(nodes.sound[:nodes.n])
+    if args.audio_output == "null":
+        audio.start(NullOutput())
+    elif args.audio_output.endswith(".wav"):
+        audio.start(FileOutput(args.audio_output, realtime=True))
+    else:
+        audio.start()
+
+
+# worker processes are spawned and re-import this file, so only run the app
+# when started directly
+if __name__ == "__main__":
+    args = parser.parse_args()
+    startup = Startup(LAUNCH)
+    startup.mark("imports", start=0.0)
+
+    # the camera, the model and the audio device are independent and each
+    # takes a while, so bring them up together. Frames are shown as soon as
+    # the camera is ready; hands are detected once the model has loaded.
+    startup.run("camera", open_camera)
+    startup.run("model", load_model)
+    startup.run("audio", start_audio)
+
+    window_start = startup.now()
+    cv2.namedWindow("Hand Tracking")
+    cv2.setMouseCallback("Hand Tracking", mouse_event)
+    startup.mark("window", start=window_start)
+
+    # settings and the --scene file load samples into the engine and hook
+    # into it, so they wait until start_audio has configured it
+    try:
+        startup.wait("audio")
+    except Exception:
+        pass    # already reported; carry on without sound
+    apply_settings()
+
+    cap = startup.wait("camera")
+    if capture is not None:
+        capture.start()
 
-    cv2.imshow("Hand Tracking", img)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    if args.pipeline:
+        run_pipelined(cap)
+    else:
+        run_serial(cap)
 
-cap.release()
-cv2.destroyAllWindows()
+    cap.release()
+    cv2.destroyAllWindows()
+    if recorder is not None:
+        print(f"recorded {recorder.close()} frames to {args.record}")
+    if capture is not None:
+        print(f"captured to {args.capture}:", *capture.close(), sep="\n  ")
+    if args.fps:
+        if isinstance(detect, FlowTracker):
+            print(detect.stats())
+        print("node index:", nodes.index.stats())
+        print("landmark index:", hand_tracking.landmark_index.stats())
+        print("audio latency ms p50/p95/max: %.1f / %.1f / %.1f" % audio.latency_stats(),
+              " voices stolen:", audio.stolen)
+        print("sample bank:", audio.bank.stats())
+        print("effects:", *[e.stats() for e in EFFECTS.values()], sep="\n  ")
+        if governor is not None:
+            print(governor.stats())
+        print(f"capture -> render delay: {pipeline_delay * 1000:.1f} ms")
+    if profiler.enabled:
+        print("\n".join(profiler.summary()))
+    if args.profile_out:
+        print(f"wrote {profiler.dump(args.profile_out)} spans to {args.profile_out}")
+    audio.stop()
+    startup.wait("model")
+    hand_tracking.set_backend(None)
@@ -0,0 +1,176 @@
+import math
+
+import numpy as np
+
+from frame_pool import MAX_HANDS
+
+# px past a node's edge the detected fingertip may be for a prediction to touch it
+MARGIN = 10
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter (Casiez et al.) over a whole array of coordinates at
+    once. Slow movement is smoothed hard (less jitter), fast movement
+    lightly (less lag): the cutoff rises with the filtered speed,
+    cutoff = min_cutoff + beta * |velocity|, per point.
+
+    `velocity` holds the filtered derivative in units per second, which
+    is what the prediction extrapolates with.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.velocity = None
+        self.t = None
+
+    @staticmethod
+    def _alpha(dt, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        """Filters x (float array, fixed shape) observed at time t (seconds)."""
+        x = np.asarray(x, np.float32)
+        if self.value is None or self.value.shape != x.shape:
+            self.value = x.copy()
+            self.velocity = np.zeros_like(x)
+            self.t = t
+            return self.value
+
+        dt = t - self.t
+        if dt <= 0:
+            return self.value
+        self.t = t
+
+        a_d = self._alpha(dt, self.d_cutoff)
+        self.velocity += a_d * ((x - self.value) / dt - self.velocity)
+
+        speed = np.linalg.norm(self.velocity, axis=-1, keepdims=True)
+        cutoff = self.min_cutoff + self.beta * speed
+        a = self._alpha(dt, cutoff)
+        self.value += a * (x - self.value)
+        return self.value
+
+
+class HandMotion:
+    """
+    Per-hand, per-landmark motion filtering and prediction.
+
+    Hands are matched to slots frame to frame by wrist distance, so each
+    hand keeps its own filter state and its own previous touch point
+    (MediaPipe's hand order is not stable). A slot not seen for
+    `lost_after` seconds is freed and its filter reset.
+
+    update() smooths the landmark array in place (so the drawn skeleton
+    is smoothed too); touch_points() then gives, per hand, the active
+    landmarks extrapolated `lead` seconds ahead at constant velocity, as
+    segments for swept collision tests, keyed by slot so a finger keeps
+    its touch state when MediaPipe reorders the hands. A prediction may
+    only start a touch on a node the detected (unfiltered, so not lagging)
+    landmark is within `margin` px of (NodeTable.update_touches `near`):
+    extrapolating a finger that is about to stop otherwise overshoots
+    into nodes it never reaches (touch_latency_report.py: 27 false
+    triggers per 85 touches without the gate, 6 with it).
+
+    d_cutoff is higher than the usual 1 Hz: a heavily smoothed velocity
+    lags behind strikes and overshoots when the finger stops
+    (touch_latency_report.py: 5 Hz halves the trigger delay of 1 Hz).
+    """
+
+    def __init__(self, max_hands=MAX_HANDS, min_cutoff=1.0, beta=0.01, d_cutoff=5.0,
+                 max_match=150.0, lost_after=0.2, margin=MARGIN):
+        self.filters = [OneEuroFilter(min_cutoff, beta, d_cutoff) for _ in range(max_hands)]
+        self.seen = [None] * max_hands      # last time each slot was matched
+        # each slot's predicted landmarks from the last touch_points() call
+        self.prev_point = np.zeros((max_hands, 21, 2), np.int32)
+        self.prev_valid = np.zeros((max_hands, 21), bool)
+        # each slot's landmarks as detected, before smoothing
+        self.detected = np.zeros((max_hands, 21, 2), np.int32)
+        self.max_match = max_match
+        self.lost_after = lost_after
+        self.margin = margin
+        self.slots = []                     # slot of each hand from the last update
+
+    def _match(self, hands, t):
+        for s, seen in enumerate(self.seen):
+            if seen is not None and t - seen > self.lost_after:
+                self.filters[s].reset()
+                self.seen[s] = None
+                self.prev_valid[s] = False
+
+        slots = [None] * len(hands)
+        taken = set()
+        # closest (hand, slot) pairs first
+        pairs = []
+        for h, hand in enumerate(hands):
+            for s, f in enumerate(self.filters):
+                if self.seen[s] is not None:
+                    d = float(np.hypot(*(hand[0] - f.value[0])))
+                    if d < self.max_match:
+                        pairs.append((d, h, s))
+        for d, h, s in sorted(pairs):
+            if slots[h] is None and s not in taken:
+                slots[h] = s
+                taken.add(s)
+        for h in range(len(hands)):
+            if slots[h] is None:
+                free = [s for s in range(len(self.filters)) if s not in taken]
+                # prefer never-used or lost slots, else take over the oldest
+                free.sort(key=lambda s: -1 if self.seen[s] is None else self.seen[s])
+                s = free[0]
+                self.filters[s].reset()
+                self.prev_valid[s] = False
+                slots[h] = s
+                taken.add(s)
+        return slots
+
+    def update(self, hands, t):
+        """Smooths int (n, 21, 2) landmarks captured at time t in place and returns them."""
+        self.slots = self._match(hands, t)
+        for hand, s in zip(hands, self.slots):
+            self.detected[s] = hand
+            np.copyto(hand, self.filters[s](hand, t), casting="unsafe")
+            self.seen[s] = t
+        return hands
+
+    def touch_points(self, landmarks, lead):
+        """
+        Returns (points, previous, keys, near): int32 (m, 2) segment ends
+        and starts, the touch state key of each (slot * 21 + landmark) and
+        the detected point each may start touches near (see `margin`).
+        For every hand and every landmark in `landmarks` (an index or an
+        array of them) there are two segments, both ending at the landmark
+        from the last update() moved `lead` seconds ahead:
+          - from that hand's predicted point on the previous call, so a
+            fast swipe can't jump over a node between frames,
+          - from where the filtered point is now, so a node the finger is
+            still in stays touched while the prediction overshoots out of
+            it (otherwise it would fire again when the prediction settles).
+        """
+        landmarks = np.atleast_1d(np.asarray(landmarks, np.intp))
+        shape = (len(self.slots), 2, len(landmarks))
+        points = np.empty(shape + (2,), np.int32)
+        previous = np.empty(shape + (2,), np.int32)
+        keys = np.empty(shape, np.intp)
+        near = np.empty(shape + (2,), np.int32)
+        for h, s in enumerate(self.slots):
+            f = self.filters[s]
+            now = f.value[landmarks]
+            # truncate like int()
+            pred = (now + f.velocity[landmarks] * lead).astype(np.int32)
+            points[h] = pred
+            previous[h, 0] = np.where(self.prev_valid[s, landmarks, None],
+                                      self.prev_point[s, landmarks], pred)
+            previous[h, 1] = now
+            near[h] = self.detected[s, landmarks]
+            keys[h] = s * 21 + landmarks
+            self.prev_point[s, landmarks] = pred
+            self.prev_valid[s, landmarks] = True
+        return points.reshape(-1, 2), previous.reshape(-1, 2), keys.ravel(), near.reshape(-1, 2)
@@ -1,104 +1,231 @@
-import pygame
 import cv2
-from effects import trigger_node_effect, update_node_effects
+import numpy as np
+from effects import trigger_node_effects, update_node_effects
+from spatial_index import GridIndex
+from audio_engine import AudioEngine
+from profiler import profiler
+from frame_pool import MAX_HANDS
 
-pygame.mixer.init()
+# touch state is kept per node for every (hand, landmark) pair: key = hand * 21 + landmark,
+# as one bit of the node's "touching" mask
+TOUCH_KEYS = MAX_HANDS * 21
+assert TOUCH_KEYS <= 63
 
-nodes = [
-    {"x":200, "y":200, "radius":40, "sound":pygame.mixer.Sound("note1.wav"),
-     "touched":False, "pulse_r":0, "glow_alpha":0, "shockwave_r":0, "particles":[]},
+# every node's sample lives in this engine's bank; main.py starts it
+audio = AudioEngine()
 
-    {"x":400, "y":300, "radius":40, "sound":pygame.mixer.Sound("note2.wav"),
-     "touched":False, "pulse_r":0, "glow_alpha":0, "shockwave_r":0, "particles":[]},
 
-    {"x":600, "y":150, "radius":40, "sound":pygame.mixer.Sound("note3.wav"),
-     "touched":False, "pulse_r":0, "glow_alpha":0, "shockwave_r":0, "particles":[]}
-]
-
-# green node
-node_x = 300
-node_y = 450
-node_radius = 60
-sound_main = pygame.mixer.Sound("note.wav")
-touched_main = False
-
-# green node effects
-main_effect = {"pulse_r":0, "glow_alpha":0, "shockwave_r":0}
-main_particles = []
-
-
-def handle_blue_collisions(img, hand_points, effect_mode):
+class NodeTable:
     """
-    Checks collision with blue nodes.
-    Also triggers their visual effect + sound.
+    All nodes as one row each in parallel NumPy arrays: position, radius,
+    touch state and colours (running effects are kept by the effects
+    themselves, see effects.Effect). The green "main" node is just
+    another row with its own colour and glow padding. Each row belongs to
+    a named group (scene.py saves a group's shared settings once).
+
+    A GridIndex over the node circles narrows every hit test down to the
+    nodes near the query points; the exact test on those candidates is a
+    single (points x candidates) squared-distance matrix.
     """
-    for node in nodes:
-        hit = False
-
-        for (hx, hy) in hand_points:
-            if ((hx - node["x"])**2 + (hy - node["y"])**2)**0.5 < node["radius"]:
-                hit = True
-                if not node["touched"]:
-                    node["sound"].play()
-                    trigger_node_effect(node, effect_mode)
-                    node["touched"] = True
 
-        if not hit:
-            node["touched"] = False
+    # column name -> (dtype, per-row shape)
+    COLUMNS = {
+        "x": (np.int32, ()),
+        "y": (np.int32, ()),
+        "radius": (np.int32, ()),
+        "touched": (bool, ()),            # any key touching
+        "touching": (np.int64, ()),       # bit k set: key k is touching
+        "color": (np.uint8, (3,)),
+        "touched_color": (np.uint8, (3,)),
+        "glow_pad": (np.int32, ()),
+        "burst": (np.int32, ()),
+        "sound": (np.int32, ()),          # AudioEngine sample id, -1 = silent
+        "group": (np.int32, ()),          # index into groups
+    }
+
+    def __init__(self, capacity=16, cell_size=64):
+        self.n = 0
+        self.index = GridIndex(cell_size)
+        self.groups = []                # group names
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        for name, (dtype, shape) in self.COLUMNS.items():
+            new = np.zeros((capacity,) + shape, dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, x, y, radius, sound, color=(255,0,0), touched_color=(0,255,0),
+            glow_pad=12, burst=10, group="default"):
+        """Appends a node and returns its row index."""
+        if self.n == self.capacity:
+            self._alloc(self.capacity * 2)
+
+        i = self.n
+        self.x[i], self.y[i], self.radius[i] = x, y, radius
+        self.color[i] = color
+        self.touched_color[i] = touched_color
+        self.glow_pad[i] = glow_pad
+        self.burst[i] = burst
+        self.sound[i] = sound
+        self.group[i] = self.group_id(group)
+        self.index.insert(i, x, y, radius)
+        self.n += 1
+        return i
+
+    def load(self, columns, groups):
+        """
+        Replaces every node with the rows in `columns` (column name ->
+        array, e.g. from scene.py), all at once. Columns not given, such
+        as touch state, start at zero.
+        """
+        n = len(columns["x"])
+        self.n = 0
+        self._alloc(max(16, n))
+        for name, values in columns.items():
+            getattr(self, name)[:n] = values
+        self.n = n
+        self.groups = list(groups)
+        self.index.clear()
+        self.index.insert_many(np.arange(n), self.x[:n], self.y[:n], self.radius[:n])
+
+    def group_id(self, name):
+        if name not in self.groups:
+            self.groups.append(name)
+        return self.groups.index(name)
+
+    def __len__(self):
+        return self.n
+
+    def move(self, i, x, y):
+        self.x[i] = x
+        self.y[i] = y
+        self.index.update(i, x, y, self.radius[i])
+
+    def hit_matrix(self, points, rows):
+        """Bool (len(points), len(rows)): point p is inside node rows[j]."""
+        pts = np.asarray(points, np.int64).reshape(-1, 2)
+        dx = pts[:, 0, None] - self.x[None, rows]
+        dy = pts[:, 1, None] - self.y[None, rows]
+        r = self.radius[rows].astype(np.int64)
+        return dx * dx + dy * dy < r * r
+
+    def sweep_matrix(self, starts, ends, rows):
+        """
+        Bool (len(starts), len(rows)): the segment starts[i] -> ends[i]
+        passes through node rows[j] (closest point on the segment inside it).
+        """
+        p0 = np.asarray(starts, np.float64).reshape(-1, 1, 2)
+        d = np.asarray(ends, np.float64).reshape(-1, 1, 2) - p0
+        c = np.stack([self.x[rows], self.y[rows]], axis=-1)[None].astype(np.float64)
+        dd = (d * d).sum(-1)
+        t = np.clip(((c - p0) * d).sum(-1) / np.where(dd > 0, dd, 1.0), 0.0, 1.0)
+        closest = p0 + t[..., None] * d
+        dist2 = ((c - closest) ** 2).sum(-1)
+        r = self.radius[rows].astype(np.float64)
+        return dist2 < r * r
+
+    def hit_test(self, x, y):
+        """Index of the first node containing (x, y), or None."""
+        rows = self.index.query(x, y)
+        if not rows:
+            return None
+        hits = np.flatnonzero(self.hit_matrix([(x, y)], rows)[0])
+        return rows[hits[0]] if hits.size else None
+
+    def update_touches(self, points, previous=None, keys=None, near=None, margin=0):
+        """
+        Updates touch state and returns the rows that were just touched.
+        With `previous` (where each point was last frame) the whole path
+        since then is tested, so a fast swipe can't skip over a node.
+
+        `near` (one position per point) gates new touches: a point can only
+        start touching a node if its `near` position is within the node's
+        radius plus `margin`. Predicted points use it so an overshooting
+        prediction can't play a node the finger never gets close to; a
+        node already touched stays held without it.
+
+        `keys` gives each point's touch state key (default: its position
+        in `points`); several points may share one, e.g. two segments of
+        the same fingertip. A node is touched again whenever a key starts
+        touching it, even while others still are, so several fingers can
+        play one node.
+        """
+        n = self.n
+        points = np.asarray(points, np.int64).reshape(-1, 2)
+        keys = np.arange(len(points)) if keys is None else np.asarray(keys, np.intp)
+        if previous is None:
+            rows = self.index.query_many(points)
+            m = self.hit_matrix(points, rows) if rows else None
+        else:
+            rows = self.index.query_segments(previous, points)
+            m = self.sweep_matrix(previous, points, rows) if rows else None
+
+        # bit mask per candidate row of the keys whose points hit it
+        rows = np.array(rows, np.intp)
+        hit = np.zeros(len(rows), np.int64)
+        if m is not None:
+            bit = np.left_shift(1, keys, dtype=np.int64)
+            hit = np.bitwise_or.reduce(np.where(m, bit[:, None], 0), axis=0)
+            if near is not None:
+                near = np.asarray(near, np.int64).reshape(-1, 2)
+                dx = near[:, 0, None] - self.x[None, rows]
+                dy = near[:, 1, None] - self.y[None, rows]
+                reach = self.radius[rows].astype(np.int64) + margin
+                close = dx * dx + dy * dy < reach * reach
+                hit &= np.bitwise_or.reduce(np.where(close, bit[:, None], 0), axis=0) \
+                    | self.touching[rows]
+        new = hit & ~self.touching[rows]
+
+        # only candidate rows can be touched now; everything else is released
+        self.touching[:n] = 0
+        self.touching[rows] = hit
+        self.touched[:n] = self.touching[:n] != 0
+
+        return rows[np.flatnonzero(new)]
+
+
+nodes = NodeTable()
+
+# blue nodes
+nodes.add(200, 200, 40, audio.load("note1.wav"), group="blue")
+nodes.add(400, 300, 40, audio.load("note2.wav"), group="blue")
+nodes.add(600, 150, 40, audio.load("note3.wav"), group="blue")
 
-        col = (0,255,0) if node["touched"] else (255,0,0)
-        cv2.circle(img, (node["x"], node["y"]), node["radius"], col, -1)
-
-        update_node_effects(img, node)
+# green node
+MAIN = nodes.add(300, 450, 60, audio.load("note.wav"),
+                 color=(0,255,0), touched_color=(0,255,0), glow_pad=15, burst=14,
+                 group="main")
 
 
-def handle_green_collision(img, hand_points, effect_mode):
+def handle_collisions(img, hand_points, effect_mode, previous_points=None, keys=None,
+                      near=None, margin=0):
     """
-    Checks collision with the main green node + draws it.
+    Checks every hand point (or, with previous_points, the path each
+    point moved along since last frame) against every node in one pass,
+    plays the sound and starts the effects (an effect mode, see
+    effects.effect_names) of nodes that were just touched, then draws all
+    nodes and their effects. `keys`, `near` and `margin` are as in
+    NodeTable.update_touches. Returns the rows that were just touched.
     """
-    global node_x, node_y, node_radius
-    global touched_main, main_effect, main_particles
-
-    hit = False
-    for (hx, hy) in hand_points:
-        if ((hx - node_x)**2 + (hy - node_y)**2)**0.5 < node_radius:
-            hit = True
-            break
-
-    if hit and not touched_main:
-        sound_main.play()
-        from effects import trigger_node_effect as _dummy  # ignore
-        # trigger main effect
-        if effect_mode == "pulse":
-            main_effect["pulse_r"] = node_radius
-        elif effect_mode == "glow":
-            main_effect["glow_alpha"] = 255
-        elif effect_mode == "shockwave":
-            main_effect["shockwave_r"] = node_radius
-
-        touched_main = True
-
-    elif not hit:
-        touched_main = False
-
-    cv2.circle(img, (node_x, node_y), node_radius, (0,255,0), -1)
-
-    # update green effects
-    pr = main_effect["pulse_r"]
-    if pr > 0:
-        cv2.circle(img, (node_x,node_y), pr, (0,255,255), 2)
-        main_effect["pulse_r"] += 4
-        if main_effect["pulse_r"] > node_radius*3:
-            main_effect["pulse_r"] = 0
-
-    sr = main_effect["shockwave_r"]
-    if sr > 0:
-        cv2.circle(img, (node_x,node_y), sr, (255,255,0), 1)
-        main_effect["shockwave_r"] += 6
-        if main_effect["shockwave_r"] > node_radius*4:
-            main_effect["shockwave_r"] = 0
-
-    ga = main_effect["glow_alpha"]
-    if ga > 0:
-        cv2.circle(img, (node_x,node_y), node_radius+15, (0,ga,255), 2)
-        main_effect["glow_alpha"] = max(0, ga - 15)
+    with profiler.stage("collision"):
+        started = nodes.update_touches(hand_points, previous_points, keys, near, margin)
+        for sound in nodes.sound[started].tolist():
+            if sound >= 0:
+                audio.trigger(sound)
+        trigger_node_effects(nodes, started, effect_mode)
+
+    with profiler.stage("nodes"):
+        n = nodes.n
+        cols = np.where(nodes.touched[:n, None], nodes.touched_color[:n], nodes.color[:n])
+        for x, y, r, col in zip(nodes.x[:n].tolist(), nodes.y[:n].tolist(),
+                                nodes.radius[:n].tolist(), cols.tolist()):
+            cv2.circle(img, (x, y), r, col, -1)
+
+    with profiler.stage("effects"):
+        update_node_effects(img, nodes)
+
+    return started
@@ -0,0 +1,138 @@
+import cv2
+import numpy as np
+
+
+class Widget:
+    """
+    Something drawn on top of the camera frame at a fixed position.
+
+    state() returns a hashable snapshot of whatever the widget's look
+    depends on; rasterize() is only called again when it changes.
+    """
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def state(self):
+        return None
+
+    def rasterize(self):
+        """Returns (bgr, alpha): uint8 (h, w, 3) and uint8 (h, w) images."""
+        raise NotImplementedError
+
+
+class TextWidget(Widget):
+    """Single line of text on a dark box, e.g. an FPS readout."""
+
+    def __init__(self, x, y, text_fn, scale=0.5, color=(230, 230, 230), pad=4):
+        super().__init__(x, y)
+        self.text_fn = text_fn
+        self.scale = scale
+        self.color = color
+        self.pad = pad
+
+    def state(self):
+        return self.text_fn()
+
+    def rasterize(self):
+        text = self.text_fn()
+        (tw, th), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self.scale, 1)
+        w, h = tw + 2 * self.pad, th + base + 2 * self.pad
+        bgr = np.full((h, w, 3), 30, np.uint8)
+        cv2.putText(bgr, text, (self.pad, self.pad + th), cv2.FONT_HERSHEY_SIMPLEX,
+                    self.scale, self.color, 1)
+        return bgr, np.full((h, w), 255, np.uint8)
+
+
+class Overlay:
+    """
+    Retained-mode UI layer.
+
+    Widgets are rasterised once into BGR + alpha sprites and composed
+    into one layer covering their combined bounding box. Each frame the
+    layer is blitted onto the camera image in a single masked copy (or
+    alpha blend if any widget is translucent) over that box only. The
+    layer is recomposed only when some widget's state() changes.
+    """
+
+    def __init__(self):
+        self.widgets = []
+        self._states = []
+        self._sprites = []
+        self.layer = None       # (x0, y0, bgr, alpha, mode)
+        self.rasterized = 0     # how many times a widget was re-rendered
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        self._states.append(object())   # never equal: forces the first raster
+        self._sprites.append(None)
+        return widget
+
+    def remove(self, widget):
+        i = self.widgets.index(widget)
+        del self.widgets[i], self._states[i], self._sprites[i]
+        self.layer = None
+
+    def _refresh(self):
+        changed = self.layer is None
+        for i, w in enumerate(self.widgets):
+            s = w.state()
+            if s != self._states[i]:
+                self._states[i] = s
+                self._sprites[i] = w.rasterize()
+                self.rasterized += 1
+                changed = True
+        if changed:
+            self._compose()
+
+    def _compose(self):
+        if not self.widgets:
+            self.layer = None
+            return
+
+        boxes = [(w.x, w.y, w.x + s[0].shape[1], w.y + s[0].shape[0])
+                 for w, s in zip(self.widgets, self._sprites)]
+        x0 = min(b[0] for b in boxes)
+        y0 = min(b[1] for b in boxes)
+        x1 = max(b[2] for b in boxes)
+        y1 = max(b[3] for b in boxes)
+
+        bgr = np.zeros((y1 - y0, x1 - x0, 3), np.uint8)
+        alpha = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        for (bx0, by0, bx1, by1), (sb, sa) in zip(boxes, self._sprites):
+            region = (slice(by0 - y0, by1 - y0), slice(bx0 - x0, bx1 - x0))
+            cv2.copyTo(sb, sa, bgr[region])
+            np.maximum(alpha[region], sa, out=alpha[region])
+
+        # pick the cheapest blit that is still exact
+        if (alpha == 255).all():
+            mode = "copy"
+        elif np.isin(alpha, (0, 255)).all():
+            mode = "mask"
+        else:
+            mode = "blend"
+        self.layer = (x0, y0, bgr, alpha, mode)
+
+    def draw(self, img):
+        """Blits all widgets onto img."""
+        self._refresh()
+        if self.layer is None:
+            return
+
+        x0, y0, bgr, alpha, mode = self.layer
+        h, w = img.shape[:2]
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x0 + bgr.shape[1], w), min(y0 + bgr.shape[0], h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+
+        src = (slice(cy0 - y0, cy1 - y0), slice(cx0 - x0, cx1 - x0))
+        dst = img[cy0:cy1, cx0:cx1]
+        if mode == "copy":
+            dst[:] = bgr[src]
+        elif mode == "mask":
+            cv2.copyTo(bgr[src], alpha[src], dst)
+        else:
+            a = alpha[src][..., None].astype(np.float32) / 255.0
+            dst[:] = (bgr[src] * a + dst * (1.0 - a)).astype(np.uint8)
@@ -0,0 +1,203 @@
+import threading
+import time
+
+from frame_pool import FramePool, detect_frame, mirror_frame
+
+
+class LatestSlot:
+    """
+    Single-slot queue between two pipeline stages.
+    put() overwrites whatever is still waiting, so the reader always
+    gets the newest item and stale frames are dropped instead of queued.
+    """
+
+    def __init__(self, on_drop=None):
+        self._cond = threading.Condition()
+        self._item = None
+        self.closed = False
+        self.dropped = 0
+        self.on_drop = on_drop      # called with each item that gets overwritten
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(self._item)
+            self._item = item
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Returns the newest item, or None on timeout / close."""
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FpsCounter:
+    """Counts ticks and reports the rate over the last reporting window."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.fps = 0.0
+        self._window_start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def tick(self):
+        with self._lock:
+            self.count += 1
+
+    def sample(self):
+        """Updates fps from ticks since the last sample and returns it."""
+        with self._lock:
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            if elapsed > 0:
+                self.fps = self.count / elapsed
+            self.count = 0
+            self._window_start = now
+            return self.fps
+
+
+def format_fps(counters):
+    return "  ".join(f"{c.name}: {c.fps:5.1f}" for c in counters)
+
+
+class Pipeline:
+    """
+    Capture -> inference -> render pipeline.
+
+    The capture thread reads the camera as fast as it delivers frames and
+    keeps only the newest one, so frames never pile up in the driver.
+    The inference thread runs `detect` on the newest captured frame; with
+    inference_threads > 1 several frames are in flight at once (useful with
+    a multi-worker inference.ProcessInference) and results that finish
+    after a newer frame's are dropped.
+    Rendering stays on the caller's thread (cv2.imshow / waitKey must)
+    and pulls the newest (frame, detected, capture time) with next_result().
+
+    Frames come from a frame_pool.FramePool and every dropped or finished
+    frame goes back to it, so the steady state allocates no images.
+    With mirror_landmarks the capture thread doesn't flip the image:
+    inference runs on the camera image, the landmarks are mirrored instead,
+    and the flip for display happens on the render thread, off the
+    capture -> inference path.
+    """
+
+    def __init__(self, cap, detect, flip=True, inference_threads=1,
+                 mirror_landmarks=False, shape=(480, 640, 3)):
+        self.cap = cap
+        self.detect = detect
+        self.flip = flip
+        self.inference_threads = inference_threads
+        self.mirror_landmarks = flip and mirror_landmarks
+
+        # one frame per place a frame can be: capture, both slots, each
+        # inference thread and the one being rendered
+        self.pool = FramePool(count=4 + inference_threads, shape=shape)
+        self.frames = LatestSlot(on_drop=self.pool.release)
+        self.results = LatestSlot(on_drop=self.pool.release)
+        self._rendering = None
+
+        self.capture_fps = FpsCounter("capture")
+        self.inference_fps = FpsCounter("inference")
+        self.render_fps = FpsCounter("render")
+
+        self.running = False
+        self._threads = []
+        self._result_lock = threading.Lock()
+        self._last_seq = -1
+        self.out_of_order = 0
+        self.detect_time = 0.0      # seconds the last detect call took
+
+    def start(self):
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        ]
+        for i in range(self.inference_threads):
+            self._threads.append(threading.Thread(
+                target=self._inference_loop, name=f"inference-{i}", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self.running = False
+        self.frames.close()
+        self.results.close()
+        # frees the capture thread if it is waiting for a frame
+        self.pool.release(self._rendering)
+        self._rendering = None
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+    def _capture_loop(self):
+        seq = 0
+        while self.running:
+            frame = self.pool.acquire(timeout=0.1)
+            if frame is None:
+                continue
+            frame = self.pool.read(self.cap, frame,
+                                   mirror_pixels=self.flip and not self.mirror_landmarks)
+            if frame is None:
+                break
+            frame.seq = seq
+            self.frames.put(frame)
+            self.capture_fps.tick()
+            seq += 1
+
+        self.running = False
+        self.frames.close()
+
+    def _inference_loop(self):
+        while self.running:
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            start = time.perf_counter()
+            detect_frame(self.detect, frame, self.mirror_landmarks)
+            self.detect_time = time.perf_counter() - start
+            self.inference_fps.tick()
+
+            with self._result_lock:
+                if frame.seq < self._last_seq:
+                    # another thread already delivered a newer frame
+                    self.out_of_order += 1
+                    self.pool.release(frame)
+                    continue
+                self._last_seq = frame.seq
+                self.results.put(frame)
+
+        self.results.close()
+
+    def next_result(self, timeout=0.1):
+        """
+        Returns the newest (frame, detected, capture time), or None if
+        nothing new arrived. frame and detected are pooled buffers, valid
+        until the next call.
+        """
+        frame = self.results.get(timeout)
+        if frame is None:
+            return None
+        # the caller is done with the previous frame
+        self.pool.release(self._rendering)
+        self._rendering = frame
+        if self.mirror_landmarks:
+            mirror_frame(frame)
+        self.render_fps.tick()
+        return frame.img, frame.hands, frame.t
+
+    def counters(self):
+        return [self.capture_fps, self.inference_fps, self.render_fps]
+
+    def dropped(self):
+        """Frames skipped because a newer one replaced them before being used."""
+        return self.frames.dropped + self.results.dropped + self.out_of_order
@@ -0,0 +1,169 @@
+import collections
+import csv
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from overlay import Widget
+
+
+class _NullStage:
+    """What stage() returns while profiling is off: entering it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """
+    Per-stage frame timings.
+
+        with profiler.stage("collision"):
+            ...
+
+    While disabled, stage() hands back one shared no-op context manager,
+    so instrumentation can stay in the code for good. While enabled, each
+    stage keeps its last `window` durations for rolling percentiles, and
+    with `trace` on every timed span is also kept (up to max_events) so
+    the session can be written out with dump() as a Chrome trace
+    (chrome://tracing, Perfetto) or as CSV.
+
+    Stages may be timed from any thread; traces show one row per thread.
+    """
+
+    def __init__(self, enabled=False, window=300, trace=False, max_events=1_000_000):
+        self.enabled = enabled
+        self.window = window
+        self.trace = trace
+        self.max_events = max_events
+        self.durations = {}     # stage -> deque of durations in ns
+        self.order = []         # stages in the order first seen
+        self.events = []        # (stage, thread id, start ns, end ns)
+        self.events_dropped = 0
+        self.threads = {}       # thread id -> name
+        self.t0 = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.trace = self.trace or trace
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, start, end):
+        """Adds one span (perf_counter_ns start/end) for stage `name`."""
+        d = self.durations.get(name)
+        if d is None:
+            with self._lock:
+                d = self.durations.get(name)
+                if d is None:
+                    d = self.durations[name] = collections.deque(maxlen=self.window)
+                    self.order.append(name)
+        d.append(end - start)
+
+        if self.trace:
+            if len(self.events) >= self.max_events:
+                self.events_dropped += 1
+                return
+            tid = threading.get_ident()
+            if tid not in self.threads:
+                self.threads[tid] = threading.current_thread().name
+            self.events.append((name, tid, start, end))
+
+    def percentiles(self, name, q=(50, 95, 99)):
+        """Rolling percentiles of a stage in ms."""
+        d = self.durations.get(name)
+        if not d:
+            return (0.0,) * len(q)
+        return tuple(np.percentile(np.fromiter(list(d), np.int64), q) / 1e6)
+
+    def summary(self):
+        """One line per stage: name, p50 / p95 / p99 ms."""
+        lines = [f"{'stage':<12}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        for name in list(self.order):
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{name:<12}{p50:7.2f}{p95:7.2f}{p99:7.2f}")
+        return lines
+
+    def dump(self, path):
+        """Writes the recorded spans to `path`: Chrome trace for .json, else CSV."""
+        events = list(self.events)
+        if path.endswith(".json"):
+            trace = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": tid,
+                      "args": {"name": name}} for tid, name in self.threads.items()]
+            trace += [{"name": name, "ph": "X", "pid": 0, "tid": tid,
+                       "ts": (start - self.t0) / 1000, "dur": (end - start) / 1000}
+                      for name, tid, start, end in events]
+            with open(path, "w") as f:
+                json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        else:
+            with open(path, "w", newline="") as f:
+                out = csv.writer(f)
+                out.writerow(["stage", "thread", "start_ms", "duration_ms"])
+                for name, tid, start, end in events:
+                    out.writerow([name, self.threads[tid],
+                                  f"{(start - self.t0) / 1e6:.3f}",
+                                  f"{(end - start) / 1e6:.3f}"])
+        return len(events)
+
+
+class ProfilerHud(Widget):
+    """On-screen p50/p95/p99 table; re-rendered at most every `interval` seconds."""
+
+    def __init__(self, x, y, profiler, interval=0.5, scale=0.4, line_h=16):
+        super().__init__(x, y)
+        self.profiler = profiler
+        self.interval = interval
+        self.scale = scale
+        self.line_h = line_h
+        self._lines = []
+        self._next = 0.0
+
+    def state(self):
+        now = time.perf_counter()
+        if now >= self._next:
+            self._next = now + self.interval
+            self._lines = self.profiler.summary()
+        return tuple(self._lines)
+
+    def rasterize(self):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        w = 8 + max(cv2.getTextSize(line, font, self.scale, 1)[0][0] for line in self._lines)
+        h = 6 + self.line_h * len(self._lines)
+        bgr = np.full((h, w, 3), 30, np.uint8)
+        for i, line in enumerate(self._lines):
+            cv2.putText(bgr, line, (4, self.line_h * (i + 1)), font, self.scale,
+                        (230, 230, 230), 1)
+        return bgr, np.full((h, w), 255, np.uint8)
+
+
+# shared by every module that times a stage; main.py turns it on
+profiler = Profiler()
@@ -0,0 +1,395 @@
+import collections
+import csv
+import os
+import queue
+import threading
+import time
+import wave
+
+import cv2
+import numpy as np
+
+from frame_pool import MAX_HANDS
+
+VIDEO_NAME = "frames.avi"
+DATA_NAME = "session.npz"
+
+
+# -----------------------------
+# BACKGROUND VIDEO ENCODER
+# -----------------------------
+class VideoEncoder:
+    """
+    Encodes frames on a background thread, so the render loop only pays
+    for a copy.
+
+    Frames live in `buffers` preallocated buffers. submit() copies a frame
+    into a free one and queues it without ever waiting: if every buffer is
+    still queued (the encoder has fallen behind), the frame is dropped and
+    counted. Code that would rather wait (offline renders) fills buffers
+    itself with acquire(block=True) and write().
+
+    With timestamps (submit(img, t)) frames are placed on the output's
+    fixed frame grid counted from t0: a gap left by a dropped or slow frame
+    repeats the previous frame, and a frame landing on a slot that already
+    has one is skipped (before it is copied), so the video keeps step with
+    the wall clock (and
+    with an AudioMixdown over the same t0). Without them every frame is
+    written in order.
+    """
+
+    def __init__(self, path, fps, shape=None, buffers=8, fourcc="MJPG"):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffers = buffers
+        self.t0 = None
+        self.writer = None
+        self.free = None
+        self.todo = queue.Queue()
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0        # submitted while no buffer was free
+        self.repeated = 0       # extra copies of a frame written to fill a gap
+        self.skipped = 0        # frames that landed on a slot already taken
+        self.max_queued = 0
+        self.busy = 0.0         # seconds spent encoding
+
+        self._slots = 0         # grid slots written so far
+        self._queued_slot = -1  # last slot submit() queued a frame for
+        self._last = None       # last frame written, kept to fill gaps
+        self._thread = None
+        if shape is not None:
+            self._open(shape)
+
+    def _open(self, shape):
+        h, w = shape[:2]
+        self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                      self.fps, (w, h))
+        self.free = queue.Queue()
+        for _ in range(self.buffers):
+            self.free.put(np.empty(shape, np.uint8))
+        self._thread = threading.Thread(target=self._run, name="encoder", daemon=True)
+        self._thread.start()
+
+    def acquire(self, block=False):
+        """A free buffer, or None if there is none (and block is False)."""
+        try:
+            return self.free.get(block)
+        except queue.Empty:
+            return None
+
+    def release(self, buf):
+        """Gives back a buffer from acquire() that isn't going to be written."""
+        self.free.put(buf)
+
+    def write(self, buf, t=None):
+        """Queues a buffer from acquire(); it is released once encoded."""
+        self.todo.put((buf, t))
+        self.max_queued = max(self.max_queued, self.todo.qsize())
+
+    def submit(self, img, t=None):
+        """Queues a copy of img, or drops it if the encoder is behind. Never blocks."""
+        if self.writer is None:
+            self._open(img.shape)
+        self.submitted += 1
+        if t is not None:
+            if self.t0 is None:
+                self.t0 = t
+            slot = round((t - self.t0) * self.fps)
+            if slot <= self._queued_slot:
+                # the slot already has a frame coming; don't spend a copy on it
+                self.skipped += 1
+                return False
+            self._queued_slot = slot
+        buf = self.acquire()
+        if buf is None:
+            self.dropped += 1
+            return False
+        np.copyto(buf, img)
+        self.write(buf, t)
+        return True
+
+    def _encode(self, img, copies=1):
+        start = time.perf_counter()
+        for _ in range(copies):
+            self.writer.write(img)
+        self.busy += time.perf_counter() - start
+        self.written += copies
+
+    def _run(self):
+        while True:
+            item = self.todo.get()
+            if item is None:
+                break
+            img, t = item
+            if t is None:
+                self._encode(img)
+                self.free.put(img)
+                continue
+
+            slot = max(0, round((t - self.t0) * self.fps))
+            if slot < self._slots:
+                self.skipped += 1
+                self.free.put(img)
+                continue
+            gap = slot - self._slots
+            if gap:
+                # repeat the last frame; before the first one, the first one itself
+                self.repeated += gap
+                if self._last is not None:
+                    self._encode(self._last, gap)
+                else:
+                    self._encode(img, gap)
+            self._encode(img)
+            self._slots = slot + 1
+            if self._last is not None:
+                self.free.put(self._last)
+            self._last = img
+
+    def close(self):
+        if self._thread is not None:
+            self.todo.put(None)
+            self._thread.join()
+            self.writer.release()
+            self._thread = None
+
+    def stats(self):
+        return (f"video: {self.submitted} submitted, {self.written} written, "
+                f"{self.dropped} dropped, {self.repeated} repeated, {self.skipped} skipped, "
+                f"queue max {self.max_queued}/{self.buffers}, "
+                f"encode {self.busy / max(self.written, 1) * 1000:.2f} ms/frame")
+
+
+# -----------------------------
+# AUDIO MIXDOWN
+# -----------------------------
+class AudioMixdown:
+    """
+    Collects the notes an AudioEngine plays (as its trigger_hook) and
+    renders them into a WAV at close(): each note starts at its trigger
+    time counted from t0, the same t0 as the video, so notes line up with
+    the frames that fired them. Mixed from the engine's sample bank with
+    no voice limit or device latency: the notes as played, not as the
+    sound card delayed them.
+    """
+
+    def __init__(self, path, engine, t0=None, block_seconds=1.0):
+        self.path = path
+        self.engine = engine
+        self.t0 = t0
+        self.block = int(block_seconds * engine.sample_rate)
+        self.notes = collections.deque()    # (sample_id, gain, t); appends are thread-safe
+
+    def add(self, sample_id, gain, t):
+        self.notes.append((sample_id, gain, t))
+
+    def close(self, end=None):
+        """Writes the WAV, at least up to time `end`. Returns the number of notes."""
+        rate, channels = self.engine.sample_rate, self.engine.channels
+        notes = sorted((max(0, round((t - self.t0) * rate)), sample_id, gain)
+                       for sample_id, gain, t in self.notes)
+        data = {sample_id: self.engine.bank.get(sample_id) for _, sample_id, _ in notes}
+        total = round((end - self.t0) * rate) if end is not None else 0
+        for start, sample_id, _ in notes:
+            total = max(total, start + len(data[sample_id]))
+
+        mix = np.zeros((self.block, channels), np.float32)
+        out = np.zeros((self.block, channels), np.int16)
+        active = []
+        k = 0
+        with wave.open(self.path, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            for b in range(0, total, self.block):
+                n = min(self.block, total - b)
+                while k < len(notes) and notes[k][0] < b + n:
+                    active.append(notes[k])
+                    k += 1
+                mix[:] = 0
+                for start, sample_id, gain in active:
+                    src = data[sample_id][max(0, b - start):b + n - start]
+                    at = max(0, start - b)
+                    mix[at:at + len(src)] += src * gain
+                active = [a for a in active if a[0] + len(data[a[1]]) > b + n]
+                np.clip(mix, -1.0, 1.0, out=mix)
+                np.multiply(mix, 32767, out=out, casting="unsafe")
+                wav.writeframes(out[:n].tobytes())
+        return len(notes)
+
+
+class PerformanceRecorder:
+    """
+    Records a performance into a directory, without holding up the loop:
+
+      performance.avi  the frames as shown, on a fixed `fps` grid (VideoEncoder)
+      performance.wav  the notes played, aligned to the video (AudioMixdown)
+      events.csv       node touches: video frame, seconds, node, effect
+
+    Everything is timed from start(); add_frame() takes a copy of the
+    frame, the encoding happens on a background thread.
+    """
+
+    def __init__(self, path, engine, fps=30.0, buffers=8):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.engine = engine
+        self.fps = fps
+        self.video = VideoEncoder(os.path.join(path, "performance.avi"), fps, buffers=buffers)
+        self.audio = AudioMixdown(os.path.join(path, "performance.wav"), engine)
+        self.events = []
+        self.t0 = None
+        self.last_t = None
+
+    def start(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.video.t0 = self.audio.t0 = self.t0
+        self.engine.trigger_hook = self.audio.add
+
+    def add_frame(self, img, t):
+        """Queues the finished frame shown at time t (perf_counter)."""
+        self.last_t = t
+        return self.video.submit(img, t)
+
+    def add_events(self, rows, effect, t):
+        frame = round((t - self.t0) * self.fps)
+        for row in rows:
+            self.events.append((frame, round(t - self.t0, 4), int(row), effect))
+
+    def close(self):
+        self.engine.trigger_hook = None
+        self.video.close()
+        notes = self.audio.close(end=self.last_t)
+        with open(os.path.join(self.path, "events.csv"), "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(("frame", "time", "node", "effect"))
+            out.writerows(self.events)
+        return [self.video.stats(), f"audio: {notes} notes, events: {len(self.events)} touches"]
+
+
+# -----------------------------
+# SESSIONS (for replay.py)
+# -----------------------------
+class SessionRecorder:
+    """
+    Records a session into a directory:
+
+      frames.avi   the camera frames as they went into drawing (MJPG),
+                   unless video=False; encoded in the background
+      session.npz  per frame:
+                     t         capture time (s, from the first frame)
+                     delay     capture -> render (s)
+                     hands     int32 (N, MAX_HANDS, 21, 2) landmarks
+                     n_hands
+                     selected  selected landmark index
+                     effect    effect name
+                     node_xy   int32 (N, nodes, 2) node positions
+                     active    bool (N, 21) landmarks that played the nodes
+                     in_video  whether the frame made it into frames.avi
+                   the frame shape, and one row per node touch:
+                     event_frame, event_node, event_effect
+
+    session.npz is also a landmark session for touch_latency_report.py.
+    """
+
+    def __init__(self, path, fps=30.0, video=True):
+        self.path = path
+        self.fps = fps
+        os.makedirs(path, exist_ok=True)
+        self.encoder = VideoEncoder(os.path.join(path, VIDEO_NAME), fps) if video else None
+        self.t0 = None
+        self.frames = 0
+        self.shape = None
+
+        self.t, self.delay, self.hands, self.n_hands = [], [], [], []
+        self.selected, self.effect, self.node_xy, self.in_video = [], [], [], []
+        self.active = []
+        self.events = []        # (frame, node, effect)
+
+    def add_frame(self, img, hands, captured_at, delay, selected, effect, node_xy,
+                  active=()):
+        """Records one frame; call before anything is drawn onto img."""
+        self.in_video.append(self.encoder is not None and self.encoder.submit(img))
+
+        if self.t0 is None:
+            self.t0 = captured_at
+            self.shape = img.shape
+        padded = np.zeros((MAX_HANDS, 21, 2), np.int32)
+        padded[:len(hands)] = hands[:MAX_HANDS]
+        self.t.append(captured_at - self.t0)
+        self.delay.append(delay)
+        self.hands.append(padded)
+        self.n_hands.append(min(len(hands), MAX_HANDS))
+        self.selected.append(selected)
+        self.effect.append(effect)
+        self.node_xy.append(np.array(node_xy, np.int32))
+        mask = np.zeros(21, bool)
+        mask[np.asarray(active, np.intp)] = True
+        self.active.append(mask)
+        self.frames += 1
+
+    def add_events(self, rows, effect):
+        """Records the nodes touched in the frame last passed to add_frame."""
+        for row in rows:
+            self.events.append((self.frames - 1, int(row), effect))
+
+    def close(self):
+        if self.encoder is not None:
+            self.encoder.close()
+        np.savez_compressed(
+            os.path.join(self.path, DATA_NAME),
+            t=np.array(self.t), delay=np.array(self.delay),
+            hands=np.array(self.hands, np.int32).reshape(-1, MAX_HANDS, 21, 2),
+            n_hands=np.array(self.n_hands, np.int32),
+            selected=np.array(self.selected, np.int32),
+            effect=np.array(self.effect, str),
+            node_xy=np.array(self.node_xy, np.int32),
+            active=np.array(self.active, bool).reshape(-1, 21),
+            in_video=np.array(self.in_video, bool),
+            event_frame=np.array([e[0] for e in self.events], np.int32),
+            event_node=np.array([e[1] for e in self.events], np.int32),
+            event_effect=np.array([e[2] for e in self.events], str),
+            fps=self.fps, shape=np.array(self.shape or (480, 640, 3)))
+        return self.frames
+
+
+def load_session(path):
+    """Returns the arrays of a recorded session as a dict."""
+    with np.load(os.path.join(path, DATA_NAME)) as data:
+        return {k: data[k] for k in data.files}
+
+
+def session_frames(path, count, shape=(480, 640, 3), in_video=None):
+    """
+    Yields `count` frames of a session: from its video when there is one,
+    else black frames of `shape`. Frames the recorder had to drop
+    (in_video False) come out black too. Frames are drawn on, so each one
+    is only valid until the next is requested (buffers are reused).
+    """
+    blank = np.zeros(shape, np.uint8)
+    video = os.path.join(path, VIDEO_NAME)
+    cap = cv2.VideoCapture(video) if os.path.exists(video) else None
+    buf = None
+    for i in range(count):
+        if cap is None or (in_video is not None and not in_video[i]):
+            blank[:] = 0
+            yield blank
+            continue
+        success, img = cap.read(buf)
+        if not success:
+            break
+        buf = img
+        yield img
+    if cap is not None:
+        cap.release()
+
+
+def events_by_frame(session):
+    """{frame: [(node, effect), ...]} for the recorded node touches."""
+    out = {}
+    for f, n, e in zip(session["event_frame"].tolist(), session["event_node"].tolist(),
+                       session["event_effect"].tolist()):
+        out.setdefault(f, []).append((n, e))
+    return out
@@ -0,0 +1,188 @@
+"""
+Replays a session recorded with main.py --record through the same
+collision, effect and UI path, without a camera or a model.
+
+    python replay.py SESSION_DIR [--realtime] [--show] [--out video.avi] [--compare]
+                     [main.py options, e.g. --predict --profile]
+
+Each frame gets the recorded landmarks, selected and active landmarks,
+effect and node positions, and is drawn with the recorded capture -> render delay,
+so --predict leads by the same amount as it did live. Frames go to a
+null sink unless --show (window) or --out (video file) is given; by
+default they are replayed as fast as possible, with --realtime at the
+recorded capture times.
+
+Prints the replay frame rate and compares the node touches with the
+recorded ones frame by frame (--compare: exit 1 if they differ). Options
+not listed here go to main.py's parser; audio defaults to --audio-output null.
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import main
+import ui
+import hand_tracking
+from nodes import nodes
+from profiler import profiler
+from recording import load_session, session_frames, events_by_frame
+
+
+class NullSink:
+    """Drops frames; replay speed is then the drawing path alone."""
+
+    def show(self, img):
+        return True
+
+    def close(self):
+        pass
+
+
+class WindowSink:
+    def show(self, img):
+        cv2.imshow("Replay", img)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+class VideoSink:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.writer = None
+
+    def show(self, img):
+        if self.writer is None:
+            h, w = img.shape[:2]
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"MJPG"),
+                                          self.fps, (w, h))
+        self.writer.write(img)
+        return True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+def set_nodes(node_xy):
+    """Moves the nodes to the recorded positions (they can be dragged while recording)."""
+    for i in np.flatnonzero((node_xy[:, 0] != nodes.x[:nodes.n]) |
+                            (node_xy[:, 1] != nodes.y[:nodes.n])):
+        nodes.move(int(i), int(node_xy[i, 0]), int(node_xy[i, 1]))
+
+
+def replay(session, path, sinks, realtime=False):
+    """Draws every recorded frame. Returns ({frame: [(node, effect)]}, frames, seconds)."""
+    t, delay = session["t"], session["delay"]
+    hands, n_hands = session["hands"], session["n_hands"]
+    node_xy = session["node_xy"]
+    if node_xy.shape[1] != nodes.n:
+        print(f"session has {node_xy.shape[1]} nodes, layout has {nodes.n}: "
+              "nodes stay where they are")
+        node_xy = None
+
+    fired = {}
+    detected = np.zeros(hands.shape[1:], np.int32)
+    frames = 0
+    start = time.perf_counter()
+    for i, img in enumerate(session_frames(path, len(t), tuple(session["shape"]),
+                                           session.get("in_video"))):
+        if realtime:
+            wait = start + t[i] - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        ui.current_effect = str(session["effect"][i])
+        hand_tracking.selected_landmark = int(session["selected"][i])
+        if "active" in session:
+            hand_tracking.touch_landmarks = np.flatnonzero(session["active"][i]).tolist()
+        if node_xy is not None:
+            set_nodes(node_xy[i])
+        # drawing smooths the landmarks in place; keep the session intact
+        n = int(n_hands[i])
+        detected[:n] = hands[i, :n]
+
+        busy = time.perf_counter()
+        with profiler.stage("frame"):
+            started = main.draw_frame(img, detected[:n], t[i], now=t[i] + delay[i])
+        if main.governor is not None:
+            main.governor.tick(time.perf_counter() - busy)
+        if len(started):
+            fired[i] = [(int(row), ui.current_effect) for row in started]
+
+        frames += 1
+        if not all([sink.show(img) for sink in sinks]):
+            break
+    return fired, frames, time.perf_counter() - start
+
+
+def compare(recorded, replayed, frames):
+    """Prints the frames whose node touches differ. Returns how many differ."""
+    differ = [i for i in range(frames) if recorded.get(i, []) != replayed.get(i, [])]
+    for i in differ[:10]:
+        print(f"  frame {i}: recorded {recorded.get(i, [])}, replayed {replayed.get(i, [])}")
+    if len(differ) > 10:
+        print(f"  ... {len(differ) - 10} more")
+    return len(differ)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Replay a recorded session",
+                                     epilog="other options are passed to main.py")
+    parser.add_argument("session", help="directory written by main.py --record")
+    parser.add_argument("--realtime", action="store_true",
+                        help="pace frames by their recorded capture times")
+    parser.add_argument("--show", action="store_true", help="show frames in a window")
+    parser.add_argument("--out", help="write the drawn frames to this video file (MJPG)")
+    parser.add_argument("--compare", action="store_true",
+                        help="exit with status 1 if node touches differ from the recording")
+    opts, rest = parser.parse_known_args()
+
+    main.parser.set_defaults(audio_output="null")
+    main.args = main.parser.parse_args(rest)
+    main.apply_settings()
+
+    session = load_session(opts.session)
+    # effects picked while recording, e.g. stacks added with --effect-stack
+    for mode in np.unique(session["effect"]).tolist():
+        try:
+            ui.add_effect_option(str(mode))
+        except ValueError as e:
+            parser.error(f"session {opts.session}: {e}")
+    main.start_audio()
+
+    sinks = [NullSink()]
+    if opts.show:
+        sinks.append(WindowSink())
+    if opts.out:
+        sinks.append(VideoSink(opts.out, float(session["fps"])))
+
+    try:
+        fired, frames, seconds = replay(session, opts.session, sinks, opts.realtime)
+    finally:
+        for sink in sinks:
+            sink.close()
+        main.audio.stop()
+
+    recorded = events_by_frame(session)
+    print(f"replayed {frames}/{len(session['t'])} frames in {seconds:.2f} s "
+          f"({frames / max(seconds, 1e-9):.1f} fps)")
+    print(f"node touches: recorded {sum(map(len, recorded.values()))}, "
+          f"replayed {sum(map(len, fired.values()))}")
+    differ = compare(recorded, fired, frames)
+    print(f"frames with different touches: {differ}")
+    if profiler.enabled:
+        print("\n".join(profiler.summary()))
+    if main.args.profile_out:
+        print(f"wrote {profiler.dump(main.args.profile_out)} spans to {main.args.profile_out}")
+    if opts.compare and differ:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
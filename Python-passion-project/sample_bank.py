@@ -0,0 +1,153 @@
+import collections
+import os
+import struct
+import threading
+
+import numpy as np
+
+# semitone offsets of a major scale
+MAJOR_SCALE = [0, 2, 4, 5, 7, 9, 11]
+
+
+def scale_semitones(degree, scale=MAJOR_SCALE):
+    """Semitone offset of the n-th note of a scale, climbing octaves."""
+    octave, step = divmod(degree, len(scale))
+    return 12 * octave + scale[step]
+
+
+class MappedWav:
+    """
+    A 16-bit PCM WAV whose sample data is memory-mapped, not read.
+    Only the RIFF header is parsed up front; the OS pages audio in when
+    a variant is first rendered from it, and shares those pages between
+    every process mapping the same file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave_id != b"WAVE":
+                raise ValueError(f"{path}: not a WAV file")
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{path}: no data chunk")
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = struct.unpack("<HHIIHH", f.read(16))
+                    f.seek(size - 16 + (size & 1), 1)
+                elif chunk_id == b"data":
+                    data_offset, data_size = f.tell(), size
+                    break
+                else:
+                    f.seek(size + (size & 1), 1)
+
+        if fmt is None or fmt[0] != 1 or fmt[5] != 16:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+
+        self.channels = fmt[1]
+        self.sample_rate = fmt[2]
+        frames = data_size // (2 * self.channels)
+        self.pcm = np.memmap(path, dtype="<i2", mode="r", offset=data_offset,
+                             shape=(frames, self.channels))
+
+    def __len__(self):
+        return len(self.pcm)
+
+
+class SampleBank:
+    """
+    Memory-mapped base samples plus pitch/gain variants rendered on demand.
+
+    add() maps a WAV (no decoding). variant() registers a (sample,
+    semitones, gain) combination and returns its id; nothing is rendered
+    until get() asks for it. Rendered variants are kept in an LRU cache
+    bounded by budget_bytes, so a large node grid can map every node to
+    a note of a scale from a handful of files.
+    """
+
+    def __init__(self, sample_rate=44100, channels=2, budget_bytes=64 * 1024 * 1024):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.budget_bytes = budget_bytes
+
+        self.bases = []             # base id -> MappedWav
+        self.paths = {}             # absolute path -> base id
+        self.variants = []          # variant id -> (base id, semitones, gain)
+        self.variant_ids = {}       # (base id, semitones, gain) -> variant id
+
+        self.cache = collections.OrderedDict()  # variant id -> float32 (frames, ch)
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def add(self, path):
+        """Maps a WAV file (once per file, however the path is written) and returns its base id."""
+        key = os.path.abspath(path)
+        with self._lock:
+            if key not in self.paths:
+                self.paths[key] = len(self.bases)
+                self.bases.append(MappedWav(path))
+            return self.paths[key]
+
+    def variant(self, base, semitones=0, gain=1.0):
+        """Returns the id of a pitch-shifted / scaled version of a base sample."""
+        key = (base, float(semitones), float(gain))
+        with self._lock:
+            if key not in self.variant_ids:
+                self.variant_ids[key] = len(self.variants)
+                self.variants.append(key)
+            return self.variant_ids[key]
+
+    def get(self, variant_id):
+        """float32 (frames, channels) audio for a variant, rendering it if needed."""
+        with self._lock:
+            data = self.cache.get(variant_id)
+            if data is not None:
+                self.cache.move_to_end(variant_id)
+                self.hits += 1
+                return data
+            self.misses += 1
+            base, semitones, gain = self.variants[variant_id]
+            wav = self.bases[base]
+
+        data = self._render(wav, semitones, gain)
+
+        with self._lock:
+            cached = self.cache.get(variant_id)
+            if cached is not None:
+                # another thread rendered it meanwhile; keep one copy
+                return cached
+            self.cache[variant_id] = data
+            self.cached_bytes += data.nbytes
+            # always keep the newest entry, even if it alone is over budget
+            while self.cached_bytes > self.budget_bytes and len(self.cache) > 1:
+                _, old = self.cache.popitem(last=False)
+                self.cached_bytes -= old.nbytes
+        return data
+
+    def _render(self, wav, semitones, gain):
+        # playing `ratio` times faster raises pitch by `semitones`
+        ratio = 2.0 ** (semitones / 12.0) * wav.sample_rate / self.sample_rate
+        src = wav.pcm
+        n = int(len(src) / ratio)
+        pos = np.arange(n) * ratio
+
+        out = np.empty((n, self.channels), np.float32)
+        scale = gain / 32768.0
+        if wav.channels == self.channels:
+            for c in range(self.channels):
+                out[:, c] = np.interp(pos, np.arange(len(src)), src[:, c]) * scale
+        else:
+            mono = src.mean(axis=1)
+            out[:] = (np.interp(pos, np.arange(len(src)), mono) * scale)[:, None]
+        return out
+
+    def stats(self):
+        return (f"{len(self.bases)} files  {len(self.variants)} variants  "
+                f"cached: {len(self.cache)} ({self.cached_bytes / 1e6:.1f} MB)  "
+                f"hits: {self.hits}  misses: {self.misses}")
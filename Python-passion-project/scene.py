@@ -0,0 +1,280 @@
+"""
+Scene files: the node layout, the samples the nodes play, node groups
+and the selected effect, as JSON.
+
+    {
+     "format": 1,
+     "effect": "pulse",
+     "samples": {
+      "note1": "note1.wav",
+      "high": {"path": "note1.wav", "semitones": 12, "gain": 0.8}
+     },
+     "groups": {
+      "blue": {"radius": 40, "color": [255, 0, 0], "sample": "note1"}
+     },
+     "nodes": [
+      {"x": 200, "y": 200, "group": "blue"},
+      {"x": 300, "y": 450, "group": "blue", "radius": 60, "sample": "high"}
+     ]
+    }
+
+A node's fields override its group's, which override DEFAULTS. Colours
+are BGR like OpenCV's, sample paths are relative to the scene file, and
+a node without a sample is silent.
+
+Loading compiles the nodes into columns for NodeTable.load() and caches
+them as an .npz named after a hash of the file's contents, so a large
+scene only goes through the JSON parser once.
+"""
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import numpy as np
+
+FORMAT = 1
+
+# node fields -> value when neither the node nor its group sets it
+DEFAULTS = {
+    "radius": 40,
+    "color": [255, 0, 0],
+    "touched_color": [0, 255, 0],
+    "glow_pad": 12,
+    "burst": 10,
+    "sample": None,
+}
+
+# NodeTable columns a scene sets, besides "sound" (from "sample") and "group"
+SCENE_COLUMNS = ("x", "y", "radius", "color", "touched_color", "glow_pad", "burst")
+ROW_SHAPES = {"color": (3,), "touched_color": (3,)}
+
+
+class Scene:
+    """
+    A compiled scene. columns maps NodeTable column names to arrays, with
+    "sample" indexing samples ((path, semitones, gain), -1 = silent) and
+    "group" indexing groups.
+    """
+
+    def __init__(self, columns, samples, groups, effect, base=""):
+        self.columns = columns
+        self.samples = samples
+        self.groups = groups
+        self.effect = effect
+        self.base = base        # directory sample paths are relative to
+
+    def __len__(self):
+        return len(self.columns["x"])
+
+    def to_arrays(self):
+        arrays = {"col_" + name: values for name, values in self.columns.items()}
+        paths, semitones, gains = zip(*self.samples) if self.samples else ((), (), ())
+        arrays.update(sample_path=np.array(paths, str), sample_semitones=np.array(semitones, float),
+                      sample_gain=np.array(gains, float), groups=np.array(self.groups, str),
+                      effect=np.array(self.effect))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        columns = {name[4:]: arrays[name] for name in arrays.files if name.startswith("col_")}
+        samples = list(zip(arrays["sample_path"].tolist(), arrays["sample_semitones"].tolist(),
+                           arrays["sample_gain"].tolist()))
+        return cls(columns, samples, arrays["groups"].tolist(), str(arrays["effect"]))
+
+
+# -----------------------------
+# LOADING
+# -----------------------------
+def compile_scene(doc):
+    """Scene from a parsed scene file."""
+    if doc.get("format", FORMAT) > FORMAT:
+        raise ValueError(f"scene format {doc['format']} is newer than this version ({FORMAT})")
+
+    samples, sample_ids = [], {}
+    for name, spec in doc.get("samples", {}).items():
+        if isinstance(spec, str):
+            spec = {"path": spec}
+        sample_ids[name] = len(samples)
+        samples.append((spec["path"], float(spec.get("semitones", 0)),
+                        float(spec.get("gain", 1.0))))
+
+    groups = doc.get("groups", {})
+    group_names = list(groups)
+    group_ids = {name: i for i, name in enumerate(group_names)}
+    nodes = doc.get("nodes", [])
+    columns = {name: [] for name in SCENE_COLUMNS + ("sample", "group")}
+    for node in nodes:
+        group = node.get("group", "default")
+        if group not in group_ids:
+            group_ids[group] = len(group_names)
+            group_names.append(group)
+        fields = {**DEFAULTS, **groups.get(group, {}), **node}
+        for name in SCENE_COLUMNS:
+            columns[name].append(fields[name])
+        sample = fields["sample"]
+        if sample is not None and sample not in sample_ids:
+            raise ValueError(f"node at ({fields['x']}, {fields['y']}) plays unknown sample "
+                             f"{sample!r}")
+        columns["sample"].append(-1 if sample is None else sample_ids[sample])
+        columns["group"].append(group_ids[group])
+
+    columns = {name: np.array(values, np.int32).reshape((len(nodes),) + ROW_SHAPES.get(name, ()))
+               for name, values in columns.items()}
+    return Scene(columns, samples, group_names, doc.get("effect", "none"))
+
+
+def load_scene(path, cache_dir=None):
+    """
+    Reads and compiles a scene file, or takes it from the cache
+    (default: .scene-cache next to the file) if it hasn't changed.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    key = hashlib.sha1(b"%d\n" % FORMAT + data).hexdigest()
+    base = os.path.dirname(os.path.abspath(path))
+    cache_dir = cache_dir or os.path.join(base, ".scene-cache")
+    cached = os.path.join(cache_dir, key + ".npz")
+
+    try:
+        with np.load(cached) as arrays:
+            scene = Scene.from_arrays(arrays)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        scene = compile_scene(json.loads(data))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = cached + ".tmp.npz"
+            np.savez(tmp, **scene.to_arrays())
+            os.replace(tmp, cached)
+        except OSError as e:
+            print(f"can't cache scene {path}: {e}")
+    scene.base = base
+    return scene
+
+
+def apply_scene(scene, table, audio):
+    """Replaces the nodes of a NodeTable with the scene's, loading its samples into audio."""
+    sounds = [audio.load(os.path.join(scene.base, path), semitones, gain)
+              for path, semitones, gain in scene.samples]
+    audio.preload(sounds)
+    columns = dict(scene.columns)
+    # sample -1 (silent) picks the -1 on the end
+    columns["sound"] = np.array(sounds + [-1], np.int32)[columns.pop("sample")]
+    table.load(columns, scene.groups)
+
+
+# -----------------------------
+# SAVING
+# -----------------------------
+def scene_doc(table, bank, effect, base):
+    """
+    Scene file contents for the nodes of a NodeTable. Each group's fields
+    are those of its first node; nodes only list what differs from them.
+    """
+    n = table.n
+    samples, names = {}, {}
+    for sound in np.unique(table.sound[:n]).tolist():
+        if sound < 0:
+            continue
+        wav, semitones, gain = bank.variants[sound]
+        path = os.path.relpath(bank.bases[wav].path, base)
+        name = os.path.splitext(os.path.basename(path))[0]
+        if semitones or gain != 1.0:
+            name += f"{semitones:+g}x{gain:g}"
+        while name in samples:
+            name += "_"
+        names[sound] = name
+        if semitones or gain != 1.0:
+            samples[name] = {"path": path, "semitones": semitones, "gain": gain}
+        else:
+            samples[name] = path
+
+    rows = []
+    for i in range(n):
+        row = {name: getattr(table, name)[i].tolist() for name in SCENE_COLUMNS}
+        row["sample"] = names.get(int(table.sound[i]))
+        row["group"] = table.groups[table.group[i]]
+        rows.append(row)
+
+    groups = {}
+    for row in rows:
+        if row["group"] not in groups:
+            groups[row["group"]] = {k: v for k, v in row.items()
+                                    if k not in ("x", "y", "group") and v != DEFAULTS[k]}
+    nodes = []
+    for row in rows:
+        group = {**DEFAULTS, **groups[row["group"]]}
+        nodes.append({"x": row["x"], "y": row["y"], "group": row["group"],
+                      **{k: v for k, v in row.items()
+                         if k not in ("x", "y", "group") and v != group[k]}})
+    return {"format": FORMAT, "effect": effect, "samples": samples, "groups": groups,
+            "nodes": nodes}
+
+
+def save_scene(path, table, bank, effect):
+    """
+    Writes the current layout to a scene file, one sample, group or node
+    per line. The file is replaced in one step, so a watcher never reads
+    half of it.
+    """
+    doc = scene_doc(table, bank, effect, os.path.dirname(os.path.abspath(path)))
+
+    def entries(items):
+        return ",\n  ".join(items)
+
+    text = ("{\n"
+            f' "format": {doc["format"]},\n'
+            f' "effect": {json.dumps(doc["effect"])},\n'
+            ' "samples": {\n  ' + entries(f"{json.dumps(k)}: {json.dumps(v)}"
+                                       for k, v in doc["samples"].items()) + "\n },\n"
+            ' "groups": {\n  ' + entries(f"{json.dumps(k)}: {json.dumps(v)}"
+                                      for k, v in doc["groups"].items()) + "\n },\n"
+            ' "nodes": [\n  ' + entries(json.dumps(node) for node in doc["nodes"]) + "\n ]\n"
+            "}\n")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return len(doc["nodes"])
+
+
+# -----------------------------
+# HOT RELOAD
+# -----------------------------
+class SceneWatcher:
+    """
+    Calls reload(path) when a scene file changes on disk. poll() is cheap
+    enough for every frame: it stats the file at most every `every` seconds.
+    """
+
+    def __init__(self, path, reload, every=0.5):
+        self.path = path
+        self.reload = reload
+        self.every = every
+        self.stamp = self._stamp()
+        self.checked = time.perf_counter()
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def saved(self):
+        """Call after writing the file ourselves, so it isn't reloaded."""
+        self.stamp = self._stamp()
+
+    def poll(self, now=None):
+        """Reloads the scene if the file changed. Returns True if it did."""
+        now = time.perf_counter() if now is None else now
+        if now - self.checked < self.every:
+            return False
+        self.checked = now
+        stamp = self._stamp()
+        if stamp is None or stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        self.reload(self.path)
+        return True
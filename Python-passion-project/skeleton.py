@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+
+# bones between the 21 landmarks (same as mediapipe's HAND_CONNECTIONS,
+# copied so drawing doesn't need mediapipe imported)
+HAND_CONNECTIONS = [
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+]
+FINGERTIPS = [4, 8, 12, 16, 20]
+
+# level of detail, cheapest last
+LODS = ("full", "tips", "off")
+
+
+class SkeletonRenderer:
+    """
+    Draws hands straight from an int32 (hands, 21, 2) landmark array with
+    two OpenCV calls per frame, whatever the number of hands: one
+    cv2.polylines over every bone as a 2-point segment, and one over every
+    joint as a zero-length 2-point segment whose round caps are the joint
+    dot (a thickness of 2r covers the same pixels as a filled cv2.circle
+    of r; a 1-point polyline draws nothing).
+
+    lod:
+      "full"  bones and all 21 joints
+      "tips"  fingertip dots only
+      "off"   no skeleton
+    The rings around the selected landmarks are drawn at every level,
+    since they are the cursors that play the nodes; all of them in one
+    more cv2.polylines over copies of a precomputed circle outline.
+    """
+
+    def __init__(self, lod="full", bone_color=(224, 224, 224), bone_thickness=2,
+                 joint_color=(0, 0, 255), joint_radius=4,
+                 selected_color=(0, 255, 255), selected_radius=10):
+        if lod not in LODS:
+            raise ValueError(f"unknown skeleton lod {lod!r}")
+        self.lod = lod
+        self.bone_color = bone_color
+        self.bone_thickness = bone_thickness
+        self.joint_color = joint_color
+        self.joint_radius = joint_radius
+        self.selected_color = selected_color
+        self.selected_radius = selected_radius
+        self._bones = np.array(HAND_CONNECTIONS, np.intp)
+        self._tips = np.array(FINGERTIPS, np.intp)
+        self._ring = cv2.ellipse2Poly((0, 0), (selected_radius, selected_radius), 0, 0, 360, 10)
+
+    def draw(self, img, hands, selected=None):
+        """
+        Draws `hands` (int32 (n, 21, 2)) onto img; `selected` is a landmark
+        index, an array of them, or None.
+        """
+        if not len(hands):
+            return
+
+        if self.lod == "full":
+            cv2.polylines(img, hands[:, self._bones].reshape(-1, 2, 2), False,
+                          self.bone_color, self.bone_thickness)
+            joints = hands.reshape(-1, 1, 2)
+        elif self.lod == "tips":
+            joints = hands[:, self._tips].reshape(-1, 1, 2)
+        else:
+            joints = None
+
+        if joints is not None:
+            cv2.polylines(img, np.repeat(joints, 2, axis=1), False, self.joint_color,
+                          2 * self.joint_radius)
+
+        if selected is not None:
+            selected = np.atleast_1d(np.asarray(selected, np.intp))
+            selected = selected[(selected >= 0) & (selected < hands.shape[1])]
+            if selected.size:
+                rings = self._ring + hands[:, selected].reshape(-1, 1, 2)
+                cv2.polylines(img, rings, True, self.selected_color, 2)
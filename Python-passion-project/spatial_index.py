@@ -0,0 +1,157 @@
+import time
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid spatial hash over circles.
+
+    Each item is stored in every cell its bounding box overlaps, so a point
+    query only looks at the one cell the point falls in. Queries return
+    candidates in ascending item order; callers still do the exact
+    distance test on them.
+
+    Keeps query counters so you can check that the work per query stays
+    flat as the number of items grows.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}         # (cx, cy) -> set of items
+        self.item_boxes = {}    # item -> (cx0, cx1, cy0, cy1), the cells it is in
+
+        self.queries = 0
+        self.candidates = 0
+        self.query_time = 0.0
+
+    def __len__(self):
+        return len(self.item_boxes)
+
+    def _box(self, x, y, r):
+        cs = self.cell_size
+        return int((x - r) // cs), int((x + r) // cs), int((y - r) // cs), int((y + r) // cs)
+
+    @staticmethod
+    def _cells_in(box):
+        cx0, cx1, cy0, cy1 = box
+        return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+    def insert(self, item, x, y, r):
+        box = self._box(x, y, r)
+        for c in self._cells_in(box):
+            self.cells.setdefault(c, set()).add(item)
+        self.item_boxes[item] = box
+
+    def insert_many(self, items, x, y, r):
+        """insert() for arrays of items; the cell ranges are worked out all at once."""
+        items, x, y, r = (np.asarray(a, np.int64) for a in (items, x, y, r))
+        if not len(items):
+            return
+        cs = self.cell_size
+        x0, x1 = (x - r) // cs, (x + r) // cs
+        y0, y1 = (y - r) // cs, (y + r) // cs
+        self.item_boxes.update(zip(items.tolist(), zip(x0.tolist(), x1.tolist(),
+                                                       y0.tolist(), y1.tolist())))
+
+        # every (item, cell) pair
+        ny = y1 - y0 + 1
+        counts = (x1 - x0 + 1) * ny
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        ny = np.repeat(ny, counts)
+        cx = np.repeat(x0, counts) + k // ny
+        cy = np.repeat(y0, counts) + k % ny
+        owner = np.repeat(items, counts)
+
+        # grouped by cell
+        order = np.lexsort((cy, cx))
+        cx, cy, owner = cx[order], cy[order], owner[order]
+        new = np.flatnonzero((np.diff(cx) != 0) | (np.diff(cy) != 0)) + 1
+        starts = [0] + new.tolist()
+        ends = new.tolist() + [len(owner)]
+        owners = owner.tolist()
+        keys = zip(cx[starts].tolist(), cy[starts].tolist())
+        if not self.cells:
+            # loading a whole layout
+            self.cells = {c: set(owners[s:e]) for c, s, e in zip(keys, starts, ends)}
+            return
+        for c, s, e in zip(keys, starts, ends):
+            self.cells.setdefault(c, set()).update(owners[s:e])
+
+    def remove(self, item):
+        box = self.item_boxes.pop(item, None)
+        if box is None:
+            return
+        for c in self._cells_in(box):
+            bucket = self.cells[c]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[c]
+
+    def update(self, item, x, y, r):
+        """Moves an item; cheap when it stays in the same cells (most drag steps)."""
+        box = self._box(x, y, r)
+        if box == self.item_boxes.get(item):
+            return
+        self.remove(item)
+        for c in self._cells_in(box):
+            self.cells.setdefault(c, set()).add(item)
+        self.item_boxes[item] = box
+
+    def clear(self):
+        self.cells = {}
+        self.item_boxes = {}
+
+    def query(self, x, y):
+        """Sorted candidate items whose cells contain (x, y)."""
+        start = time.perf_counter()
+        cs = self.cell_size
+        found = sorted(self.cells.get((int(x // cs), int(y // cs)), ()))
+
+        self.queries += 1
+        self.candidates += len(found)
+        self.query_time += time.perf_counter() - start
+        return found
+
+    def query_many(self, points):
+        """Sorted union of candidates for several points."""
+        start = time.perf_counter()
+        cs = self.cell_size
+        found = set()
+        # points often share cells (fingertips of one hand): look each cell up once
+        cells = np.floor_divide(np.asarray(points, np.int64).reshape(-1, 2), cs)
+        for cell in set(map(tuple, cells.tolist())):
+            found.update(self.cells.get(cell, ()))
+        found = sorted(found)
+
+        self.queries += len(points)
+        self.candidates += len(found)
+        self.query_time += time.perf_counter() - start
+        return found
+
+    def query_segments(self, starts, ends):
+        """Sorted union of candidates for every cell a segment's bounding box touches."""
+        start = time.perf_counter()
+        cs = self.cell_size
+        found = set()
+        for (x0, y0), (x1, y1) in zip(starts, ends):
+            for cx in range(int(min(x0, x1) // cs), int(max(x0, x1) // cs) + 1):
+                for cy in range(int(min(y0, y1) // cs), int(max(y0, y1) // cs) + 1):
+                    found.update(self.cells.get((cx, cy), ()))
+        found = sorted(found)
+
+        self.queries += len(starts)
+        self.candidates += len(found)
+        self.query_time += time.perf_counter() - start
+        return found
+
+    def stats(self):
+        q = max(self.queries, 1)
+        return (f"{len(self)} items  queries: {self.queries}  "
+                f"avg candidates: {self.candidates / q:.2f}  "
+                f"avg query: {self.query_time / q * 1e6:.1f} us")
+
+    def reset_stats(self):
+        self.queries = 0
+        self.candidates = 0
+        self.query_time = 0.0
@@ -0,0 +1,118 @@
+import collections
+
+import cv2
+import numpy as np
+
+
+class SpriteCache:
+    """
+    Pre-rendered, anti-aliased alpha sprites for the round things we draw
+    every frame that need blending: the glow bloom and its fading ring.
+    Hard-edged opaque shapes (node bodies, pulse/shockwave rings) are
+    cheaper drawn straight with cv2.circle.
+
+    Sprites are keyed by (primitive, radius, colour, alpha bucket, thickness)
+    and kept in an LRU cache. Each sprite is stored premultiplied (colour
+    times alpha) together with 255 - alpha, so blitting is just two
+    saturating OpenCV ops over the sprite's box:  dst = dst * inv + pre.
+    Fully opaque discs (node bodies) keep a hard edge like cv2.circle and
+    are blitted with a single masked copy instead.
+
+    Because the Gaussian blur for the glow is paid once per sprite instead
+    of once per frame, the glow can be a real bloom.
+    """
+
+    PRIMITIVES = ("disc", "ring", "glow")
+
+    def __init__(self, alpha_levels=16, max_sprites=2048):
+        self.alpha_step = 255.0 / (alpha_levels - 1)
+        self.max_sprites = max_sprites
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bucket(self, alpha):
+        return int(round(round(alpha / self.alpha_step) * self.alpha_step))
+
+    def get(self, primitive, radius, color, alpha=255, thickness=1):
+        """Returns (pre, inv, mask, centre) for a sprite, rendering it on first use."""
+        key = (primitive, int(radius), tuple(int(c) for c in color),
+               self.bucket(alpha), thickness)
+        sprite = self.cache.get(key)
+        if sprite is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = self._render(*key)
+        self.cache[key] = sprite
+        if len(self.cache) > self.max_sprites:
+            self.cache.popitem(last=False)
+        return sprite
+
+    def _render(self, primitive, radius, color, alpha, thickness):
+        if primitive == "glow":
+            sigma = max(2.0, radius * 0.12)
+            pad = int(3 * sigma) + thickness
+        else:
+            pad = thickness + 2
+        c = radius + pad
+        size = 2 * c + 1
+
+        mask = np.zeros((size, size), np.uint8)
+        if primitive == "disc" and alpha == 255:
+            cv2.circle(mask, (c, c), radius, 255, -1)
+            pre = np.zeros((size, size, 3), np.uint8)
+            pre[mask > 0] = color
+            return pre, None, mask, c
+
+        # draw at 4x sub-pixel precision for smooth edges
+        if primitive == "disc":
+            cv2.circle(mask, (c * 4, c * 4), radius * 4, 255, -1, cv2.LINE_AA, 2)
+        elif primitive == "ring":
+            cv2.circle(mask, (c * 4, c * 4), radius * 4, 255, thickness, cv2.LINE_AA, 2)
+        elif primitive == "glow":
+            cv2.circle(mask, (c * 4, c * 4), radius * 4, 255, thickness + 2, cv2.LINE_AA, 2)
+        else:
+            raise ValueError(f"unknown sprite primitive {primitive!r}")
+
+        a = mask.astype(np.float32) / 255.0
+        if primitive == "glow":
+            a = cv2.GaussianBlur(a, (0, 0), sigma)
+            # keep the core of the bloom at full strength
+            a = np.minimum(a / max(a.max(), 1e-6) * 1.5, 1.0)
+        a *= alpha / 255.0
+
+        pre = (a[..., None] * np.array(color, np.float32)).round().astype(np.uint8)
+        inv = np.repeat(((1.0 - a) * 255).round().astype(np.uint8)[..., None], 3, axis=2)
+        return pre, inv, None, c
+
+    def blit(self, img, x, y, sprite):
+        """Alpha-blends a sprite onto img centred at (x, y), clipped to the frame."""
+        pre, inv, mask, c = sprite
+        h, w = img.shape[:2]
+        x0, y0 = x - c, y - c
+        x1, y1 = x0 + pre.shape[1], y0 + pre.shape[0]
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, w), min(y1, h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+
+        src = (slice(cy0 - y0, cy1 - y0), slice(cx0 - x0, cx1 - x0))
+        roi = img[cy0:cy1, cx0:cx1]
+        if mask is not None:
+            cv2.copyTo(pre[src], mask[src], roi)
+            return
+        cv2.multiply(roi, inv[src], dst=roi, scale=1 / 255.0)
+        cv2.add(roi, pre[src], dst=roi)
+
+    def draw(self, img, primitive, x, y, radius, color, alpha=255, thickness=1):
+        self.blit(img, int(x), int(y), self.get(primitive, radius, color, alpha, thickness))
+
+    def stats(self):
+        return f"sprites: {len(self.cache)}  hits: {self.hits}  misses: {self.misses}"
+
+
+# shared by nodes and effects
+sprites = SpriteCache()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class Startup:
+    """
+    Runs slow initialisation steps (camera, model, audio) on background
+    threads at the same time and records when each started and finished,
+    relative to process start.
+    """
+
+    def __init__(self, t0=None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.timings = {}       # name -> (start, end) seconds since t0
+        self.results = {}
+        self.errors = {}
+        self._done = {}
+        self.reported = False
+
+    def now(self):
+        return time.perf_counter() - self.t0
+
+    def mark(self, name, start=None):
+        """Records a step that ran on the calling thread and ends now."""
+        end = self.now()
+        self.timings[name] = (end if start is None else start, end)
+
+    def run(self, name, fn):
+        """Starts fn() on its own thread; wait(name) returns its result."""
+        done = threading.Event()
+        self._done[name] = done
+
+        def task():
+            start = self.now()
+            try:
+                self.results[name] = fn()
+            except Exception as e:
+                self.errors[name] = e
+                print(f"Startup step '{name}' failed: {e!r}")
+            finally:
+                self.timings[name] = (start, self.now())
+                done.set()
+
+        threading.Thread(target=task, name=f"init-{name}", daemon=True).start()
+
+    def ready(self, name):
+        return self._done[name].is_set()
+
+    def all_ready(self):
+        return all(done.is_set() for done in self._done.values())
+
+    def wait(self, name, timeout=None):
+        """Blocks until a step finishes and returns its result (re-raising its error)."""
+        self._done[name].wait(timeout)
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results.get(name)
+
+    def report(self):
+        lines = ["startup (seconds since launch):"]
+        for name, (start, end) in sorted(self.timings.items(), key=lambda kv: kv[1]):
+            lines.append(f"  {name:<14}{start:7.3f} -> {end:7.3f}  ({end - start:.3f}s)")
+        for name, err in self.errors.items():
+            lines.append(f"  {name} failed: {err!r}")
+        return "\n".join(lines)
@@ -0,0 +1,201 @@
+"""
+Trigger delay of node touches: plain fingertip test vs predictive tracking.
+
+    python touch_latency_report.py [--session rec.npz] [--delay-ms 70] [--extra-ms 0] [--margin 10]
+
+Replays a session of landmarks through two copies of the node layout:
+  plain       the selected landmark as detected, point-in-circle test
+  predictive  HandMotion smoothing + extrapolation by the measured delay,
+              swept-segment test, new touches gated on the detected point
+A frame captured at t is rendered at t + delay, which is when its
+touches fire. The true touch time is when the fingertip path (sampled
+at capture times, interpolated in between) first enters a node; each
+true touch is matched to the first trigger of that node within
+-0.3..+0.5 s. Reports the delay distribution, missed touches and
+triggers that matched no true touch (false).
+
+A session is an .npz with
+    t        (N,) capture times in seconds
+    hands    (N, MAX_HANDS, 21, 2) int32 landmarks
+    n_hands  (N,) hands per frame
+and optionally
+    delay    (N,) capture -> render seconds per frame (else --delay-ms)
+    truth    (N, MAX_HANDS, 2) noise-free selected landmark, for synthetic sessions
+Without --session a synthetic one is generated: fast strikes and swipes
+between random targets at 30 fps with 1.5 px landmark jitter.
+
+Run from the repository root like main.py (the node layout loads its WAVs).
+"""
+import argparse
+
+import numpy as np
+
+from frame_pool import MAX_HANDS
+from motion_filter import HandMotion
+from nodes import NodeTable
+
+SELECTED = 8    # index fingertip
+
+# same layout as nodes.py
+LAYOUT = [(200, 200, 40), (400, 300, 40), (600, 150, 40), (300, 450, 60)]
+
+
+def make_nodes():
+    table = NodeTable()
+    for x, y, r in LAYOUT:
+        table.add(x, y, r, -1)
+    return table
+
+
+def synthetic_session(seconds=60.0, fps=30.0, jitter=1.5, seed=0):
+    """One hand moving between random targets with a minimum-jerk profile."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0, seconds, 1 / fps)
+    tip = np.zeros((len(t), 2))
+
+    pos = np.array([320.0, 240.0])
+    i = 0
+    while i < len(t):
+        target = rng.uniform((40, 40), (600, 440))
+        duration = rng.uniform(0.12, 0.6)       # fast strikes to slow reaches
+        steps = max(1, int(duration * fps))
+        s = np.linspace(0, 1, steps + 1)[1:, None]
+        ease = 10 * s**3 - 15 * s**4 + 6 * s**5
+        path = pos + (target - pos) * ease
+        n = min(steps, len(t) - i)
+        tip[i:i + n] = path[:n]
+        i += n
+        pos = target
+        hold = int(rng.uniform(0.0, 0.3) * fps)
+        tip[i:i + hold] = pos
+        i += hold
+
+    # the rest of the hand follows the fingertip rigidly
+    offsets = np.stack([np.linspace(0, -20, 21), np.linspace(150, 0, 21)], axis=1)
+    offsets[SELECTED] = 0
+    hands = np.zeros((len(t), MAX_HANDS, 21, 2), np.int32)
+    noisy = tip[:, None, :] + offsets[None] + rng.normal(0, jitter, (len(t), 21, 2))
+    hands[:, 0] = noisy.astype(np.int32)
+    truth = np.zeros((len(t), MAX_HANDS, 2))
+    truth[:, 0] = tip
+    return {"t": t, "hands": hands, "n_hands": np.ones(len(t), np.int32), "truth": truth}
+
+
+def true_touches(t, path, n_hands):
+    """(node, time) of every entry of each hand's path into a node, interpolated."""
+    table = make_nodes()
+    c = np.stack([table.x[:table.n], table.y[:table.n]], axis=1).astype(float)
+    r = table.radius[:table.n].astype(float)
+    touches = []
+    for h in range(path.shape[1]):
+        inside = np.zeros(table.n, bool)
+        for i in range(1, len(t)):
+            if n_hands[i] <= h or n_hands[i - 1] <= h:
+                inside[:] = False
+                continue
+            p0, p1 = path[i - 1, h], path[i, h]
+            d = p1 - p0
+            # solve |p0 + u d - c| = r for the first u in [0, 1]
+            f = p0 - c
+            a = max(d @ d, 1e-9)
+            b = 2 * f @ d
+            cc = (f * f).sum(1) - r * r
+            disc = b * b - 4 * a * cc
+            for j in range(table.n):
+                if cc[j] < 0:
+                    u = 0.0 if not inside[j] else None
+                elif disc[j] >= 0:
+                    u = (-b[j] - np.sqrt(disc[j])) / (2 * a)
+                    u = u if 0 <= u <= 1 else None
+                else:
+                    u = None
+                if u is not None and not inside[j]:
+                    touches.append((j, t[i - 1] + u * (t[i] - t[i - 1])))
+                inside[j] = np.hypot(*(p1 - c[j])) < r[j]
+    return touches
+
+
+def replay(session, delay, extra, margin=None):
+    """(node, time) triggers for the plain and the predictive path."""
+    t, hands, n_hands = session["t"], session["hands"], session["n_hands"]
+    plain, predictive = make_nodes(), make_nodes()
+    motion = HandMotion() if margin is None else HandMotion(margin=margin)
+    measured = 0.0
+    fired = {"plain": [], "predictive": []}
+
+    for i in range(len(t)):
+        render_t = t[i] + delay[i]
+        detected = hands[i, :n_hands[i]].copy()
+
+        for j in plain.update_touches(detected[:, SELECTED]):
+            fired["plain"].append((int(j), render_t))
+
+        measured += 0.1 * (delay[i] - measured)
+        motion.update(detected, t[i])
+        points, previous, keys, near = motion.touch_points(SELECTED, measured + extra)
+        for j in predictive.update_touches(points, previous, keys, near, motion.margin):
+            fired["predictive"].append((int(j), render_t))
+
+    return fired
+
+
+def score(touches, triggers):
+    """Returns (delays ms, missed, false triggers)."""
+    used = set()
+    delays = []
+    missed = 0
+    for node, te in sorted(touches, key=lambda x: x[1]):
+        match = None
+        for k, (tn, tt) in enumerate(triggers):
+            if k not in used and tn == node and -0.3 <= tt - te <= 0.5:
+                match = k
+                break
+        if match is None:
+            missed += 1
+        else:
+            used.add(match)
+            delays.append((triggers[match][1] - te) * 1000)
+    return np.array(delays), missed, len(triggers) - len(used)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node trigger delay, plain vs predictive")
+    parser.add_argument("--session", help="recorded .npz (default: synthetic)")
+    parser.add_argument("--delay-ms", type=float, default=70.0,
+                        help="capture -> render delay when the session has none")
+    parser.add_argument("--extra-ms", type=float, default=0.0,
+                        help="extra look-ahead, as main.py --predict-extra-ms")
+    parser.add_argument("--margin", type=float, default=None,
+                        help="px past a node's edge a prediction may start a touch "
+                             "(default: HandMotion's)")
+    parser.add_argument("--seconds", type=float, default=120.0,
+                        help="length of the synthetic session")
+    opts = parser.parse_args()
+
+    if opts.session:
+        session = dict(np.load(opts.session))
+    else:
+        session = synthetic_session(opts.seconds)
+    t = session["t"]
+    delay = session.get("delay", np.full(len(t), opts.delay_ms / 1000))
+
+    # the true path: noise-free if the session has it, else the landmarks
+    path = session.get("truth")
+    if path is None:
+        path = session["hands"][:, :, SELECTED].astype(float)
+    touches = true_touches(t, path, session["n_hands"])
+    fired = replay(session, delay, opts.extra_ms / 1000, opts.margin)
+
+    print(f"{len(t)} frames, {len(touches)} true touches, "
+          f"mean delay {delay.mean() * 1000:.0f} ms capture -> render")
+    print(f"{'path':<12}{'p50 ms':>8}{'p95 ms':>8}{'mean ms':>9}{'missed':>8}{'false':>7}")
+    for name in ("plain", "predictive"):
+        d, missed, false = score(touches, fired[name])
+        if not len(d):
+            d = np.zeros(1)
+        print(f"{name:<12}{np.percentile(d, 50):8.1f}{np.percentile(d, 95):8.1f}"
+              f"{d.mean():9.1f}{missed:8d}{false:7d}")
+
+
+if __name__ == "__main__":
+    main()
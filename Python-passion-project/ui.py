@@ -1,13 +1,11 @@
 import cv2
+import numpy as np
+from overlay import Overlay, Widget
+from effects import EFFECTS, effect_label
 
-# EFFECT OPTIONS
-effect_options = [
-    ("none", "None"),
-    ("pulse", "Pulse Ring"),
-    ("glow", "Glow Bloom"),
-    ("shockwave", "Shockwave"),
-    ("particles", "Particle Burst")
-]
+# EFFECT OPTIONS: every registered effect; add_effect_option() adds stacks
+effect_options = [("none", "None")] + [(name, e.label) for name, e in EFFECTS.items()]
+effect_labels = dict(effect_options)
 
 current_effect = "none"
 dropdown_open = False
@@ -19,37 +17,65 @@ dd_header_h = 30
 dd_item_h = 24
 
 
-def draw_dropdown(img):
-    """Draws dropdown menu on screen."""
-    global current_effect, dropdown_open
+def add_effect_option(mode):
+    """Lists an effect mode, e.g. a stack like "pulse+glow", in the dropdown (once)."""
+    if mode not in effect_labels:
+        effect_labels[mode] = effect_label(mode)
+        effect_options.append((mode, effect_labels[mode]))
+
 
-    # find label for selected effect
-    label = "Effect: " + [txt for key, txt in effect_options if key == current_effect][0]
+def draw_dropdown(img):
+    """Draws the dropdown menu with its top-left corner at (0, 0) of img."""
+    label = "Effect: " + effect_label(current_effect)
 
-    cv2.rectangle(img, (dd_x, dd_y), (dd_x+dd_width, dd_y+dd_header_h),
+    cv2.rectangle(img, (0, 0), (dd_width, dd_header_h),
                   (40,40,40), -1)
-    cv2.rectangle(img, (dd_x, dd_y), (dd_x+dd_width, dd_y+dd_header_h),
+    cv2.rectangle(img, (0, 0), (dd_width, dd_header_h),
                   (200,200,200), 1)
 
-    cv2.putText(img, label, (dd_x+8, dd_y+20),
+    cv2.putText(img, label, (8, 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (230,230,230), 1)
 
     arrow = "▼" if not dropdown_open else "▲"
-    cv2.putText(img, arrow, (dd_x+dd_width-20, dd_y+20),
+    cv2.putText(img, arrow, (dd_width-20, 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (230,230,230), 1)
 
     if dropdown_open:
         for i, (_, text) in enumerate(effect_options):
-            top = dd_y+dd_header_h + i*dd_item_h
+            top = dd_header_h + i*dd_item_h
             bottom = top + dd_item_h
-            cv2.rectangle(img, (dd_x, top), (dd_x+dd_width, bottom),
+            cv2.rectangle(img, (0, top), (dd_width, bottom),
                           (30,30,30), -1)
-            cv2.rectangle(img, (dd_x, top), (dd_x+dd_width, bottom),
+            cv2.rectangle(img, (0, top), (dd_width, bottom),
                           (160,160,160), 1)
-            cv2.putText(img, text, (dd_x+8, top+17),
+            cv2.putText(img, text, (8, top+17),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, (230,230,230), 1)
 
 
+class DropdownWidget(Widget):
+    """The effects dropdown; re-rendered only when it opens/closes or the effect changes."""
+
+    def state(self):
+        return (dropdown_open, current_effect)
+
+    def rasterize(self):
+        h = dd_header_h + (len(effect_options) * dd_item_h if dropdown_open else 0) + 1
+        bgr = np.zeros((h, dd_width + 1, 3), np.uint8)
+        draw_dropdown(bgr)
+        # the boxes cover the whole sprite, so it is fully opaque
+        return bgr, np.full(bgr.shape[:2], 255, np.uint8)
+
+
+# all on-screen UI; other widgets (FPS readout, palettes) are added to it too
+overlay = Overlay()
+overlay.add(DropdownWidget(dd_x, dd_y))
+
+
+def draw_ui(img):
+    """Blits the cached UI layer onto the frame."""
+    overlay.draw(img)
+
+
 def ui_click(x, y):
     """Processes mouse click for dropdown."""
     global dropdown_open, current_effect